@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
 import random
 
 from google.adk import Agent
@@ -19,6 +20,9 @@ from google.adk.planners import BuiltInPlanner
 from google.adk.planners import PlanReActPlanner
 from google.adk.tools.tool_context import ToolContext
 from google.genai import types
+from hitl_shared.tracing import JsonlExporter
+from hitl_shared.tracing import OtlpJsonExporter
+from hitl_shared.tracing import Tracer
 
 
 def roll_die(sides: int, tool_context: ToolContext) -> int:
@@ -66,32 +70,82 @@ async def check_prime(nums: list[int]) -> str:
     )
 
 
+# the callbacks record spans and events instead of printing, an exporter
+# thread writes them to callback_spans.jsonl and, as OTLP/JSON, to
+# callback_spans.otlp.jsonl
+tracer = Tracer(
+    [
+        JsonlExporter('callback_spans.jsonl'),
+        OtlpJsonExporter(
+            'callback_spans.otlp.jsonl', service_name='hitl-adk-callbacks'
+        ),
+    ],
+    sample_rate=float(os.getenv('TRACE_SAMPLE_RATE', '1.0')),
+)
+
+
+def _agent_span(callback_context) -> tuple:
+    return (
+        'agent',
+        callback_context.invocation_id,
+        callback_context.agent_name,
+    )
+
+
+def _model_span(callback_context) -> tuple:
+    return (
+        'model',
+        callback_context.invocation_id,
+        callback_context.agent_name,
+    )
+
+
+def _tool_span(tool_context) -> tuple:
+    return ('tool', tool_context.function_call_id)
+
+
 async def before_agent_callback(callback_context):
-    print('@before_agent_callback')
+    tracer.event(_agent_span(callback_context), 'before_agent_callback')
     return None
 
 
 async def after_agent_callback(callback_context):
-    print('@after_agent_callback')
+    tracer.event(_agent_span(callback_context), 'after_agent_callback')
     return None
 
 
 async def before_model_callback(callback_context, llm_request):
-    print('@before_model_callback')
+    tracer.start(
+        _model_span(callback_context),
+        'model',
+        parent=_agent_span(callback_context),
+        agent=callback_context.agent_name,
+        model=llm_request.model,
+    )
     return None
 
 
 async def after_model_callback(callback_context, llm_response):
-    print('@after_model_callback')
+    if llm_response.partial:
+        tracer.event(_model_span(callback_context), 'partial response')
+        return None
+    usage = llm_response.usage_metadata
+    tracer.end(
+        _model_span(callback_context),
+        error=llm_response.error_message,
+        input_tokens=usage and usage.prompt_token_count,
+        output_tokens=usage and usage.candidates_token_count,
+    )
     return None
 
 
 def after_agent_cb1(callback_context):
-    print('@after_agent_cb1')
+    tracer.event(_agent_span(callback_context), 'after_agent_cb1')
 
 
 def after_agent_cb2(callback_context):
-    print('@after_agent_cb2')
+    # returning content stops the callback chain, the agent ends here
+    tracer.end(_agent_span(callback_context), stopped_by='after_agent_cb2')
     # ModelContent (or Content with role set to 'model') must be returned.
     # Otherwise, the event will be excluded from the context in the next turn.
     return types.ModelContent(
@@ -104,45 +158,57 @@ def after_agent_cb2(callback_context):
 
 
 def after_agent_cb3(callback_context):
-    print('@after_agent_cb3')
+    tracer.end(_agent_span(callback_context))
 
 
 def before_agent_cb1(callback_context):
-    print('@before_agent_cb1')
+    tracer.start(
+        _agent_span(callback_context),
+        f'agent {callback_context.agent_name}',
+        agent=callback_context.agent_name,
+    )
 
 
 def before_agent_cb2(callback_context):
-    print('@before_agent_cb2')
+    tracer.event(_agent_span(callback_context), 'before_agent_cb2')
 
 
 def before_agent_cb3(callback_context):
-    print('@before_agent_cb3')
+    tracer.event(_agent_span(callback_context), 'before_agent_cb3')
 
 
 async def before_tool_cb1(tool, args, tool_context):
-    print(f'@before_tool_cb1 {tool}')
+    tracer.start(
+        _tool_span(tool_context),
+        f'tool {tool.name}',
+        parent=_agent_span(tool_context),
+        agent=tool_context.agent_name,
+        tool=tool.name,
+        denied_by='before_tool_cb1',
+    )
     return "The user denied permission to use the tool"
 
 
 def before_tool_cb2(tool, args, tool_context):
-    print(f'@before_tool_cb2 {tool}')
+    tracer.event(_tool_span(tool_context), 'before_tool_cb2')
 
 
 def before_tool_cb3(tool, args, tool_context):
-    print(f'@before_tool_cb3 {tool}')
+    tracer.event(_tool_span(tool_context), 'before_tool_cb3')
 
 
 def after_tool_cb1(tool, args, tool_context, tool_response):
-    print('@after_tool_cb1')
+    tracer.event(_tool_span(tool_context), 'after_tool_cb1')
 
 
 def after_tool_cb2(tool, args, tool_context, tool_response):
-    print('@after_tool_cb2')
+    # returning a response stops the callback chain, the tool ends here
+    tracer.end(_tool_span(tool_context), stopped_by='after_tool_cb2')
     return {'test': 'after_tool_cb2', 'response': tool_response}
 
 
 def after_tool_cb3(tool, args, tool_context, tool_response):
-    print('@after_tool_cb3')
+    tracer.end(_tool_span(tool_context))
 
 
 root_agent = Agent(
@@ -0,0 +1,169 @@
+from typing import Any, Optional
+from google.adk.artifacts import InMemoryArtifactService
+from google.adk.events import Event
+from google.adk.sessions import InMemorySessionService, Session, State
+from google.genai import types
+from hitl_shared.durable import DurableStore
+from pydantic import ConfigDict
+import json
+
+
+class DurableSessionService(InMemorySessionService):
+    """
+    InMemorySessionService that journals sessions and their events to a
+    DurableStore. Sessions are served from memory, call restore() on
+    startup to rebuild them (events are replayed, which also rebuilds the
+    session, user and app state).
+
+    Args:
+        store: where the sessions are kept
+    """
+
+    def __init__(self, store: DurableStore):
+        super().__init__()
+        self.store = store
+
+    @staticmethod
+    def _scope(app_name: str, user_id: str, session_id: str) -> str:
+        return json.dumps([app_name, user_id, session_id])
+
+    async def restore(self) -> int:
+        """
+        Load the stored sessions back into memory
+
+        Returns:
+            int: the number of sessions restored
+        """
+        restored = {}
+        for scope, _, value in self.store.items("adk_session"):
+            record = json.loads(value)
+            restored[scope] = Session(app_name=record["app_name"],
+                                      user_id=record["user_id"],
+                                      id=record["id"],
+                                      state=record["state"],
+                                      last_update_time=record["created_at"])
+            self.sessions.setdefault(record["app_name"], {}).setdefault(
+                record["user_id"], {})[record["id"]] = restored[scope]
+        for scope, value in self.store.log("adk_event"):
+            session = restored.get(scope)
+            if session is not None:
+                self._replay(session, Event.model_validate_json(value))
+        return len(restored)
+
+    def _replay(self, session: Session, event: Event) -> None:
+        # what InMemorySessionService.append_event does to the stored session
+        delta = event.actions.state_delta if event.actions else None
+        for key, value in (delta or {}).items():
+            if key.startswith(State.TEMP_PREFIX):
+                continue
+            session.state[key] = value
+            if key.startswith(State.APP_PREFIX):
+                self.app_state.setdefault(session.app_name, {})[
+                    key.removeprefix(State.APP_PREFIX)] = value
+            elif key.startswith(State.USER_PREFIX):
+                self.user_state.setdefault(session.app_name, {}).setdefault(
+                    session.user_id, {})[
+                        key.removeprefix(State.USER_PREFIX)] = value
+        session.events.append(event)
+        session.last_update_time = event.timestamp
+
+    async def create_session(self,
+                             *,
+                             app_name: str,
+                             user_id: str,
+                             state: Optional[dict[str, Any]] = None,
+                             session_id: Optional[str] = None) -> Session:
+        session = await super().create_session(app_name=app_name,
+                                               user_id=user_id,
+                                               state=state,
+                                               session_id=session_id)
+        self.store.put("adk_session",
+                       self._scope(app_name, user_id, session.id), "",
+                       json.dumps({"app_name": app_name,
+                                   "user_id": user_id,
+                                   "id": session.id,
+                                   "state": state or {},
+                                   "created_at": session.last_update_time}))
+        return session
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session=session, event=event)
+        # partial (streamed) events are not kept by the session either
+        if not event.partial:
+            self.store.append("adk_event",
+                              self._scope(session.app_name, session.user_id,
+                                          session.id),
+                              event.model_dump_json(exclude_none=True))
+        return event
+
+    async def delete_session(self,
+                             *,
+                             app_name: str,
+                             user_id: str,
+                             session_id: str) -> None:
+        await super().delete_session(app_name=app_name,
+                                     user_id=user_id,
+                                     session_id=session_id)
+        scope = self._scope(app_name, user_id, session_id)
+        self.store.delete("adk_session", scope)
+        self.store.clear("adk_event", scope)
+
+
+class DurableArtifactService(InMemoryArtifactService):
+    """
+    InMemoryArtifactService that journals every saved artifact version to
+    a DurableStore, call restore() on startup to load them back
+
+    Args:
+        store: where the artifacts are kept
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    store: DurableStore
+
+    def restore(self) -> int:
+        """
+        Load the stored artifact versions back into memory
+
+        Returns:
+            int: the number of artifact versions restored
+        """
+        self.artifacts.clear()
+        versions = self.store.log("adk_artifact")
+        for path, value in versions:
+            self.artifacts.setdefault(path, []).append(
+                types.Part.model_validate_json(value))
+        return len(versions)
+
+    async def save_artifact(self,
+                            *,
+                            app_name: str,
+                            user_id: str,
+                            session_id: str,
+                            filename: str,
+                            artifact: types.Part) -> int:
+        version = await super().save_artifact(app_name=app_name,
+                                              user_id=user_id,
+                                              session_id=session_id,
+                                              filename=filename,
+                                              artifact=artifact)
+        self.store.append("adk_artifact",
+                          self._artifact_path(app_name, user_id, session_id,
+                                              filename),
+                          artifact.model_dump_json(exclude_none=True))
+        return version
+
+    async def delete_artifact(self,
+                              *,
+                              app_name: str,
+                              user_id: str,
+                              session_id: str,
+                              filename: str) -> None:
+        await super().delete_artifact(app_name=app_name,
+                                      user_id=user_id,
+                                      session_id=session_id,
+                                      filename=filename)
+        self.store.clear("adk_artifact",
+                         self._artifact_path(app_name, user_id, session_id,
+                                             filename))
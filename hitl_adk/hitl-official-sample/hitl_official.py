@@ -13,6 +13,8 @@ load_dotenv(override=True)
 APP_NAME = "human_in_the_loop"
 USER_ID = "1234"
 SESSION_ID = "session1234"
+# seconds the manager has to decide, then the reimbursement is rejected
+APPROVAL_DEADLINE = 60
 
 session_service = InMemorySessionService()
 
@@ -88,15 +90,29 @@ async def main():
         ):
             print(f"--- Simulating external approval for ticket: {ticket_id} ---\n")
 
-            updated_tool_output_data = {
+            loop = asyncio.get_running_loop()
+            approval = loop.create_future()
+            # the manager answers after 5 seconds
+            loop.call_later(5, approval.set_result, {
                 "status": "approved",
                 "ticketId": ticket_id,
                 "approver_feedback": "Approved by manager at " + str(
-                    asyncio.get_event_loop().time()
+                    loop.time()
                 ),
-            }
+            })
 
-            await asyncio.sleep(5)
+            try:
+                updated_tool_output_data = await asyncio.wait_for(
+                    approval, APPROVAL_DEADLINE
+                )
+            except asyncio.TimeoutError:
+                # nobody decided in time, don't keep the session waiting
+                updated_tool_output_data = {
+                    "status": "rejected",
+                    "ticketId": ticket_id,
+                    "approver_feedback": "No decision within"
+                    f" {APPROVAL_DEADLINE} seconds, rejected by default",
+                }
 
             updated_function_response_part = types.Part(
                 function_response=types.FunctionResponse(
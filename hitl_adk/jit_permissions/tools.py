@@ -1,27 +1,40 @@
 from arcadepy import AsyncArcade
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmResponse
 from google.adk.tools import ToolContext
-from google_adk_arcade.tools import ArcadeTool
-from pprint import pp
-from typing import Any
+from arcade_adk.tools import ArcadeTool
+from hitl_shared.approvals import get_approval_broker
+from hitl_shared.policy import APPROVE, DENY, ApprovalPolicy
+from typing import Any, Mapping
 
 
-ENFORCE_HUMAN_CONFIRMATION = [
-    "Google_SendEmail",
-    "Slack_SendDmToUser",
-]
+# sends email and Slack DMs to a human, approves everything else
+APPROVAL_POLICY = ApprovalPolicy()
+
+
+def approval_session_id(state: Mapping[str, Any]) -> str:
+    """
+    The broker session of an ADK session, read from the session state since
+    the tool and callback contexts don't expose the session itself. Sessions
+    created without a session_id in their state fall back to the user.
+    """
+    return state.get("session_id") or state["user_id"]
 
 
 async def confirm_tool_usage(tool: ArcadeTool,
                              args: Any,
-                             tool_context: ToolContext) -> None | str:
+                             tool_context: ToolContext,
+                             policy: ApprovalPolicy = APPROVAL_POLICY
+                             ) -> None | str:
     """
-    Ask the user to confirm the use of a specific tool
+    Ask the user to confirm the use of a specific tool, unless the policy
+    decides the call on its own
 
     Args:
-        context: OpenAI Agents SDK run context
-        tool_args: parameters for the function, JSON as a string.
-        tool_name: the name of the tool that we want to call
-        callable: the function that we should call if approved
+        tool: the tool that we want to call
+        args: the arguments of the call
+        tool_context: ADK tool context
+        policy: decides which calls need a human
 
     Returns:
         None | str:
@@ -31,24 +44,73 @@ async def confirm_tool_usage(tool: ArcadeTool,
             A string with a denial message that will be passed to the LLM
             in case the user does not approve the tool call
     """
-    # only applicable to tools we want to enforce confirmation for
-    if tool.name not in ENFORCE_HUMAN_CONFIRMATION:
+    user_id = tool_context.state["user_id"]
+    decision = policy.decide(user_id, tool.name, args)
+    if decision.action == APPROVE:
         return
-    print("\nThe agent requires permission:\n"
-          f"I'm about to call {tool.name} with these arguments:")
-    # pp(json.loads(args))
-    pp(args)
-    clarification = input("Your response [y/n]: ")
-    while clarification.lower() not in ["y", "n"]:
-        clarification = input("Your response (must be either y or n): ")
-    if clarification.lower() == "y":
+    if decision.action == DENY:
+        return (f"The call to {tool.name} is not allowed:"
+                f" {decision.reason}")
+    # wait on the broker instead of input() so other sessions keep running
+    request = get_approval_broker().submit(
+        tool.name,
+        args,
+        session_id=approval_session_id(tool_context.state),
+        call_id=tool_context.function_call_id,
+        deadline=decision.deadline,
+        on_timeout=decision.on_timeout,
+    )
+    if await request.future:
+        if request.grant_minutes:
+            policy.grant(user_id, tool.name, args, request.grant_minutes)
         return
+    if request.timed_out:
+        return (f"Nobody approved the call to {tool.name} in time,"
+                " it was denied")
     return (f"The user denied permission to call {tool.name}"
             " with these arguments")
 
 
+async def request_step_approvals(callback_context: CallbackContext,
+                                 llm_response: LlmResponse,
+                                 policy: ApprovalPolicy = APPROVAL_POLICY
+                                 ) -> None:
+    """
+    Submit every confirmation needed by the model's tool calls at once
+
+    ADK runs the calls of a step one after the other, so confirming them in
+    confirm_tool_usage alone means one prompt per call. As an
+    after_model_callback this submits all of them up front, the user reviews
+    them together and confirm_tool_usage joins the pending request of its
+    function call id.
+
+    Args:
+        callback_context: ADK callback context
+        llm_response: the model response holding the function calls
+        policy: decides which calls need a human
+    """
+    if not llm_response.content or not llm_response.content.parts:
+        return
+    broker = get_approval_broker()
+    user_id = callback_context.state["user_id"]
+    session_id = approval_session_id(callback_context.state)
+    for part in llm_response.content.parts:
+        call = part.function_call
+        # without an id the call can't be matched later, it is asked alone
+        if not call or not call.id:
+            continue
+        decision = policy.decide(user_id, call.name, call.args or {},
+                                 consume=False)
+        if decision.action not in (APPROVE, DENY):
+            broker.submit(call.name, call.args,
+                          session_id=session_id, call_id=call.id,
+                          deadline=decision.deadline,
+                          on_timeout=decision.on_timeout)
+
+
 async def auth_tool(client: AsyncArcade, tool_name: str, user_id: str):
     result = await client.tools.authorize(tool_name=tool_name, user_id=user_id)
     if result.status != "completed":
         print(f"Click this link to authorize {tool_name}:\n{result.url}")
     await client.auth.wait_for_completion(result)
+
@@ -1,14 +1,30 @@
-from arcadepy import AsyncArcade
 from dotenv import load_dotenv
 from google.adk import Agent, Runner
-from google.adk.artifacts import InMemoryArtifactService
 from google.adk.models.lite_llm import LiteLlm
-from google.adk.sessions import InMemorySessionService, Session
-from google_adk_arcade.tools import get_arcade_tools
+from google.adk.sessions import Session
+from arcade_adk._cache import ToolDefinitionCache
+from arcade_adk._utils import close_arcade_clients, get_arcade_client
+from arcade_adk.execution import ExecutionPolicy
+from arcade_adk.tools import get_arcade_tools
+from durable import DurableArtifactService, DurableSessionService, DurableStore
 from google.genai import types
-from jit_permissions.tools import auth_tool, confirm_tool_usage
+from hitl_shared.approvals import HttpApprovalBackend, get_approval_broker
+from hitl_shared.policy import (APPROVE, DEFAULT_RULES, ApprovalPolicy,
+                                Limit, Rule, recipient_domain_in)
+from hitl_shared.result_cache import ResultCache
+from jit_permissions.tools import (approval_session_id, confirm_tool_usage,
+                                   request_step_approvals)
+from hitl_shared.auth import auth_tools
+from hitl_shared.metrics import HitlMetrics, HttpMetricsBackend
+from metrics import MetricsCallbacks
+from hitl_shared.prompt_cache import PromptCacheStats
+from prompt_cache import LiteLlmCacheLogger, stabilize_request
+from functools import partial
+from uuid import uuid4
 
 import agentops
+import asyncio
+import litellm
 import os
 
 
@@ -22,25 +38,64 @@ async def main():
     app_name = 'my_app'
     user_id = 'mateo@arcade.dev'
 
-    session_service = InMemorySessionService()
-    artifact_service = InMemoryArtifactService()
-    client = AsyncArcade()
+    # sessions, artifacts and pending approvals survive restarts
+    store = DurableStore()
+    session_service = DurableSessionService(store)
+    await session_service.restore()
+    artifact_service = DurableArtifactService(store=store)
+    artifact_service.restore()
+    get_approval_broker().persist_to(store)
+    client = get_arcade_client()
+    tool_cache = ToolDefinitionCache()
+    # retries, deadlines and per-toolkit circuit breaking for every call,
+    # slow ListEmails/ListUsers calls get a hedged duplicate after 2s
+    policy = ExecutionPolicy(hedge_after=2.0)
+    # read-only results are reused until a write tool runs for the user
+    result_cache = ResultCache()
 
     google_tools = await get_arcade_tools(
-        client, tools=["Google_ListEmails", "Google_SendEmail"])
+        client, tools=["Google_ListEmails", "Google_SendEmail"],
+        cache=tool_cache, policy=policy, result_cache=result_cache)
     slack_tools = await get_arcade_tools(
-        client, tools=["Slack_ListUsers", "Slack_SendDmToUser"])
-
-    for tool in google_tools + slack_tools:
-        # - human in the loop
-        # if tool.name in ENFORCE_HUMAN_CONFIRMATION:
-        #     tool.on_invoke_tool = partial(
-        #         confirm_tool_usage,
-        #         tool_name=tool.name,
-        #         callback=tool.on_invoke_tool,
-        #     )
-        # - auth
-        await auth_tool(client, tool_name=tool.name, user_id=user_id)
+        client, tools=["Slack_ListUsers", "Slack_SendDmToUser"],
+        cache=tool_cache, policy=policy, result_cache=result_cache)
+
+    # for tool in google_tools + slack_tools:
+    #     - human in the loop
+    #     if tool.name in ENFORCE_HUMAN_CONFIRMATION:
+    #         tool.on_invoke_tool = partial(
+    #             confirm_tool_usage,
+    #             tool_name=tool.name,
+    #             callback=tool.on_invoke_tool,
+    #         )
+
+    # - auth, one link per provider instead of one round-trip per tool
+    await auth_tools(client,
+                     [tool.name for tool in google_tools + slack_tools],
+                     user_id=user_id)
+
+    # - human in the loop, internal email (up to 20 a day) doesn't need one
+    approval_policy = ApprovalPolicy(
+        rules=[Rule("Google_SendEmail", APPROVE,
+                    when=recipient_domain_in("arcade.dev"),
+                    name="internal email"),
+               *DEFAULT_RULES],
+        limits=[Limit("Google_SendEmail", max_calls=20, period=24 * 60 * 60)],
+    )
+    confirm = partial(confirm_tool_usage, policy=approval_policy)
+    prefetch = partial(request_step_approvals, policy=approval_policy)
+
+    # - every request is assembled the same way (sorted declarations,
+    #   canonical schemas) so the agents hit the prompt cache, LiteLLM
+    #   reports the hits
+    cache_stats = PromptCacheStats()
+    stabilize = partial(stabilize_request, stats=cache_stats)
+    litellm.callbacks.append(LiteLlmCacheLogger(cache_stats))
+
+    # - latency and tokens per agent, model call, tool and handoff, for
+    #   Prometheus at http://127.0.0.1:9464/metrics
+    metrics = HitlMetrics()
+    timing = MetricsCallbacks(metrics)
 
     google_agent = Agent(
         model=LiteLlm(model=f"openai/{os.environ["OPENAI_MODEL"]}"),
@@ -49,7 +104,12 @@ async def main():
                     " to manage a Google account, contacts, and inbox.",
         description="An agent equipped with Google tools",
         tools=google_tools,
-        before_tool_callback=[confirm_tool_usage],
+        before_agent_callback=[timing.before_agent],
+        after_agent_callback=[timing.after_agent],
+        before_model_callback=[stabilize, timing.before_model],
+        after_model_callback=[timing.after_model, prefetch],
+        before_tool_callback=[confirm, timing.before_tool],
+        after_tool_callback=[timing.after_tool],
     )
 
     slack_agent = Agent(
@@ -60,7 +120,12 @@ async def main():
                     " You have tools to manage channels and send DMs.",
         description="An agent equipped with Slack tools",
         tools=slack_tools,
-        before_tool_callback=[confirm_tool_usage],
+        before_agent_callback=[timing.before_agent],
+        after_agent_callback=[timing.after_agent],
+        before_model_callback=[stabilize, timing.before_model],
+        after_model_callback=[timing.after_model, prefetch],
+        before_tool_callback=[confirm, timing.before_tool],
+        after_tool_callback=[timing.after_tool],
     )
 
     conversation_agent = Agent(
@@ -72,13 +137,30 @@ async def main():
                     " with Slack tools if needed. Handoff to the appropriate"
                     " agent based on the services required.",
         sub_agents=[google_agent, slack_agent],
+        before_agent_callback=[timing.before_agent],
+        after_agent_callback=[timing.after_agent],
+        before_model_callback=[stabilize, timing.before_model],
+        after_model_callback=[timing.after_model],
+        before_tool_callback=[timing.before_tool],
+        after_tool_callback=[timing.after_tool],
     )
 
-    session = await session_service.create_session(
-        app_name=app_name, user_id=user_id, state={
-            "user_id": user_id,
-        }
-    )
+    # pick the conversation up where it was left before a restart
+    existing = await session_service.list_sessions(app_name=app_name,
+                                                   user_id=user_id)
+    if existing.sessions:
+        latest = max(existing.sessions, key=lambda s: s.last_update_time)
+        session = await session_service.get_session(
+            app_name=app_name, user_id=user_id, session_id=latest.id)
+    else:
+        # the tools find their approvals through the id kept in the state
+        session_id = str(uuid4())
+        session = await session_service.create_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, state={
+                "user_id": user_id,
+                "session_id": session_id,
+            }
+        )
     runner = Runner(
         app_name=app_name,
         agent=conversation_agent,
@@ -98,14 +180,29 @@ async def main():
             if event.content.parts and event.content.parts[0].text:
                 print(f'** {event.author}: {event.content.parts[0].text}')
 
-    while True:
-        user_input = input("User: ")
-        if user_input.lower() == "exit":
-            print("Goodbye!")
-            break
-        await run_prompt(session, user_input)
+    # reviewers can answer approvals over HTTP as well as on the console
+    approvals_http = HttpApprovalBackend(get_approval_broker())
+    await approvals_http.start()
+    metrics_http = HttpMetricsBackend(metrics.registry)
+    await metrics_http.start()
+
+    try:
+        while True:
+            user_input = await asyncio.to_thread(input, "User: ")
+            if user_input.lower() == "exit":
+                # nothing is left waiting on approvals of the ended session
+                get_approval_broker().close_session(
+                    approval_session_id(session.state))
+                print("Goodbye!")
+                break
+            await run_prompt(session, user_input)
+            print(f"### prompt cache: {cache_stats.end_turn()}")
+    finally:
+        await approvals_http.close()
+        await metrics_http.close()
+        await close_arcade_clients()
+        store.close()
 
 
 if __name__ == '__main__':
-    import asyncio
     asyncio.run(main())
@@ -0,0 +1,76 @@
+from typing import Any
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.adk.tools import BaseTool, ToolContext
+from hitl_shared.metrics import HitlMetrics
+import time
+
+
+class MetricsCallbacks:
+    """
+    ADK callbacks feeding HitlMetrics, add them to every agent's callback
+    lists: before_agent/after_agent for the time an agent runs,
+    before_model/after_model for model latency and usage_metadata,
+    before_tool/after_tool for tool latency (after the confirmation
+    callbacks, so denied calls aren't timed) and transfer_to_agent calls
+    as handoffs. A tool response with an "error" counts as a failed call.
+
+    Args:
+        metrics: where the measurements go
+    """
+
+    def __init__(self, metrics: HitlMetrics):
+        self.metrics = metrics
+        # (invocation, agent) -> start
+        self._agents: dict[tuple[str, str], float] = {}
+        self._models: dict[tuple[str, str], float] = {}
+        # function call id -> start
+        self._tools: dict[str, float] = {}
+
+    async def before_agent(self, callback_context: CallbackContext) -> None:
+        self._agents[(callback_context.invocation_id,
+                      callback_context.agent_name)] = time.monotonic()
+
+    async def after_agent(self, callback_context: CallbackContext) -> None:
+        started = self._agents.pop((callback_context.invocation_id,
+                                    callback_context.agent_name), None)
+        if started is not None:
+            self.metrics.agent_run(callback_context.agent_name,
+                                   time.monotonic() - started)
+
+    async def before_model(self, callback_context: CallbackContext,
+                           llm_request: LlmRequest) -> None:
+        self._models[(callback_context.invocation_id,
+                      callback_context.agent_name)] = time.monotonic()
+
+    async def after_model(self, callback_context: CallbackContext,
+                          llm_response: LlmResponse) -> None:
+        if llm_response.partial:
+            return
+        started = self._models.pop((callback_context.invocation_id,
+                                    callback_context.agent_name), None)
+        self.metrics.model_call(
+            callback_context.agent_name,
+            None if started is None else time.monotonic() - started,
+            llm_response.usage_metadata)
+
+    async def before_tool(self, tool: BaseTool, args: dict[str, Any],
+                          tool_context: ToolContext) -> None:
+        now = time.monotonic()
+        if tool.name == "transfer_to_agent":
+            started = self._agents.get((tool_context.invocation_id,
+                                        tool_context.agent_name))
+            self.metrics.handoff(
+                tool_context.agent_name, str(args.get("agent_name", "")),
+                None if started is None else now - started)
+        self._tools[tool_context.function_call_id or ""] = now
+
+    async def after_tool(self, tool: BaseTool, args: dict[str, Any],
+                         tool_context: ToolContext,
+                         tool_response: Any) -> None:
+        started = self._tools.pop(tool_context.function_call_id or "", None)
+        if started is None:
+            return
+        failed = isinstance(tool_response, dict) and "error" in tool_response
+        self.metrics.tool_call(tool_context.agent_name, tool.name,
+                               time.monotonic() - started, failed)
@@ -0,0 +1,93 @@
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+from hitl_shared.prompt_cache import (PromptCacheStats, sort_by_name,
+                                      stable_text)
+from litellm.integrations.custom_logger import CustomLogger
+
+
+def _sort_schema(schema: types.Schema | None) -> None:
+    if schema is None:
+        return
+    if schema.properties:
+        schema.properties = {name: schema.properties[name]
+                             for name in sorted(schema.properties)}
+        for value in schema.properties.values():
+            _sort_schema(value)
+    if schema.required:
+        schema.required = sorted(schema.required)
+    _sort_schema(schema.items)
+
+
+async def stabilize_request(callback_context: CallbackContext,
+                            llm_request: LlmRequest,
+                            stats: PromptCacheStats) -> None:
+    """
+    before_model_callback assembling every request the same way: the
+    system instruction normalized, function declarations sorted by name
+    with their schemas in key order, so turns and agents sharing a prefix
+    hit the provider's prompt cache. Prefix changes are counted in stats.
+
+    Args:
+        callback_context: ADK callback context
+        llm_request: the request about to be sent, changed in place
+        stats: where prefix changes are counted
+    """
+    config = llm_request.config
+    if config is None:
+        return
+    if isinstance(config.system_instruction, str):
+        config.system_instruction = stable_text(config.system_instruction)
+    declarations = []
+    for tool in config.tools or []:
+        if tool.function_declarations:
+            tool.function_declarations = sort_by_name(
+                tool.function_declarations)
+            for declaration in tool.function_declarations:
+                _sort_schema(declaration.parameters)
+            declarations.extend(tool.function_declarations)
+    if not stats.check_prefix(
+            callback_context.agent_name,
+            str(config.system_instruction),
+            [d.model_dump(mode="json", exclude_none=True)
+             for d in declarations]):
+        print(f"### prompt prefix of {callback_context.agent_name} changed,"
+              " its prompt cache starts over")
+
+
+async def record_cache_usage(callback_context: CallbackContext,
+                             llm_response: LlmResponse,
+                             stats: PromptCacheStats) -> None:
+    """
+    after_model_callback counting the cache usage of Gemini responses,
+    LiteLlm leaves the cached tokens out of usage_metadata, use
+    LiteLlmCacheLogger for those models instead
+
+    Args:
+        callback_context: ADK callback context
+        llm_response: the model response
+        stats: where cache hits are counted
+    """
+    if not llm_response.partial:
+        stats.record(llm_response.usage_metadata)
+
+
+class LiteLlmCacheLogger(CustomLogger):
+    """
+    LiteLLM callback counting the cache usage of every completion, e.g. of
+    agents using LiteLlm models. Register it in litellm.callbacks.
+
+    Args:
+        stats: where cache hits are counted
+    """
+
+    def __init__(self, stats: PromptCacheStats):
+        super().__init__()
+        self.stats = stats
+
+    def log_success_event(self, kwargs, response_obj, start_time, end_time):
+        self.stats.record(getattr(response_obj, "usage", None))
+
+    async def async_log_success_event(self, kwargs, response_obj,
+                                      start_time, end_time):
+        self.stats.record(getattr(response_obj, "usage", None))
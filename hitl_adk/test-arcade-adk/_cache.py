@@ -0,0 +1,255 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Hashable
+from arcadepy.types import ToolDefinition
+# re-exported, shared with the other frameworks
+from hitl_shared.result_cache import ResultCache  # noqa: F401
+
+
+DEFAULT_CACHE_DIR = Path(
+    os.getenv("ARCADE_TOOL_CACHE_DIR",
+              Path.home() / ".cache" / "arcade_adk" / "tools")
+)
+
+
+def _digest(payload: bytes) -> str:
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _atomic_write(path: Path, payload: bytes) -> None:
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_bytes(payload)
+    os.replace(tmp, path)
+
+
+class ToolDefinitionCache:
+    """
+    Content-addressed, on-disk cache of Arcade tool definitions.
+
+    Definitions are stored once under ``objects/<sha256>.json`` and named
+    lookups (a tool or a whole toolkit) live under ``refs/`` pointing at those
+    digests, so a tool shared by a toolkit listing and a direct lookup is only
+    stored once. Refs older than ``ttl`` seconds are stale: callers refetch
+    them and hand the result to ``put``, which only rewrites objects whose
+    digest changed (the digest covers the toolkit version, so a toolkit
+    release invalidates its tools). The Arcade API has no ETag or
+    conditional request, so revalidating a stale ref still downloads the
+    definitions, only the disk writes are saved. Once the object store grows
+    past ``max_bytes`` the least recently used objects are evicted, together
+    with the refs pointing at them.
+
+    Args:
+        path: Directory holding the cache. Defaults to ARCADE_TOOL_CACHE_DIR
+            or ~/.cache/arcade_adk/tools
+        ttl: Seconds a ref is served without revalidation.
+        max_bytes: Upper bound for the size of the object store.
+    """
+
+    def __init__(self,
+                 path: str | Path | None = None,
+                 ttl: float = 24 * 60 * 60,
+                 max_bytes: int = 16 * 1024 * 1024):
+        self.path = Path(path) if path else DEFAULT_CACHE_DIR
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._objects = self.path / "objects"
+        self._refs = self.path / "refs"
+        self._objects.mkdir(parents=True, exist_ok=True)
+        self._refs.mkdir(parents=True, exist_ok=True)
+
+    def _ref_path(self, key: str) -> Path:
+        return self._refs / f"{_digest(key.encode())}.json"
+
+    def _read_ref(self, key: str) -> dict[str, Any] | None:
+        try:
+            return json.loads(self._ref_path(key).read_bytes())
+        except (OSError, ValueError):
+            return None
+
+    def _read_object(self, digest: str) -> ToolDefinition | None:
+        path = self._objects / f"{digest}.json"
+        try:
+            definition = ToolDefinition.model_validate_json(path.read_bytes())
+        except (OSError, ValueError):
+            return None
+        # bump the mtime, it is the recency signal used for eviction
+        os.utime(path)
+        return definition
+
+    def get(self, key: str) -> tuple[list[ToolDefinition], bool] | None:
+        """
+        Look up the definitions stored under ``key``.
+
+        Returns:
+            None on a miss (or if any referenced object was evicted),
+            otherwise the definitions and whether they are still fresh.
+        """
+        ref = self._read_ref(key)
+        if ref is None:
+            return None
+        definitions = []
+        for digest in ref["digests"]:
+            definition = self._read_object(digest)
+            if definition is None:
+                # an object was evicted, the ref can't be served anymore
+                self._ref_path(key).unlink(missing_ok=True)
+                return None
+            definitions.append(definition)
+        fresh = time.time() - ref["fetched_at"] < self.ttl
+        return definitions, fresh
+
+    def put(self, key: str, definitions: list[ToolDefinition]) -> None:
+        """
+        Store (or revalidate) the definitions fetched for ``key``.
+        """
+        digests = []
+        for definition in definitions:
+            payload = json.dumps(definition.model_dump(mode="json"),
+                                 sort_keys=True,
+                                 separators=(",", ":")).encode()
+            digest = _digest(payload)
+            path = self._objects / f"{digest}.json"
+            if path.exists():
+                os.utime(path)
+            else:
+                _atomic_write(path, payload)
+            digests.append(digest)
+
+        ref = {"key": key,
+               "digests": digests,
+               "fetched_at": time.time()}
+        _atomic_write(self._ref_path(key), json.dumps(ref).encode())
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        total = 0
+        for path in self._objects.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        evicted = set()
+        # oldest first
+        for _, size, path in sorted(entries):
+            path.unlink(missing_ok=True)
+            evicted.add(path.stem)
+            total -= size
+            if total <= self.max_bytes:
+                break
+        # refs to evicted objects would only turn into misses
+        for path in self._refs.glob("*.json"):
+            try:
+                digests = json.loads(path.read_bytes())["digests"]
+            except (OSError, ValueError, KeyError):
+                path.unlink(missing_ok=True)
+                continue
+            if evicted.intersection(digests):
+                path.unlink(missing_ok=True)
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded LRU memo with hit/miss counters.
+
+    Args:
+        maxsize: Maximum number of entries kept before evicting the least
+            recently used one.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._data:
+                self.hits += 1
+                self._data.move_to_end(key)
+                return self._data[key]
+            self.misses += 1
+        # build outside the lock, a racing duplicate is harmless
+        value = factory()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize}
+
+
+class AuthorizationCache:
+    """
+    Remembers completed tool authorizations per (user_id, tool_name).
+
+    Entries expire after ``ttl`` seconds. Invalidating a tool also drops
+    every other tool of the same user that was authorized through the same
+    provider, since they share the underlying grant. Expired entries are
+    swept on every write and at most ``maxsize`` entries are kept, the
+    oldest are dropped first.
+
+    Args:
+        ttl: Seconds an authorization is trusted without asking Arcade again.
+        maxsize: Maximum number of (user_id, tool_name) entries.
+    """
+
+    def __init__(self, ttl: float = 15 * 60, maxsize: int = 4096):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        # ordered by expiry, every write moves its entry to the end
+        self._entries: OrderedDict[tuple[str, str],
+                                   tuple[float, str | None]] = OrderedDict()
+
+    def is_authorized(self, user_id: str, tool_name: str) -> bool:
+        entry = self._entries.get((user_id, tool_name))
+        if entry is None:
+            return False
+        if entry[0] <= time.monotonic():
+            del self._entries[(user_id, tool_name)]
+            return False
+        return True
+
+    def mark_authorized(self,
+                        user_id: str,
+                        tool_name: str,
+                        provider_id: str | None = None) -> None:
+        now = time.monotonic()
+        self._entries[(user_id, tool_name)] = (now + self.ttl, provider_id)
+        self._entries.move_to_end((user_id, tool_name))
+        while self._entries:
+            key, (expires, _) = next(iter(self._entries.items()))
+            if expires > now and len(self._entries) <= self.maxsize:
+                break
+            del self._entries[key]
+
+    def invalidate(self, user_id: str, tool_name: str) -> None:
+        entry = self._entries.pop((user_id, tool_name), None)
+        if entry is None or entry[1] is None:
+            return
+        for key, (_, provider_id) in list(self._entries.items()):
+            if key[0] == user_id and provider_id == entry[1]:
+                del self._entries[key]
@@ -1,8 +1,12 @@
 import asyncio
+import hashlib
+import importlib.util
 import os
-from typing import Any
-from arcadepy import AsyncArcade
+from typing import Any, AsyncIterator
+import httpx
+from arcadepy import APIConnectionError, AsyncArcade
 from arcadepy.types import ToolDefinition
+from arcade_adk._cache import LRUCache, ToolDefinitionCache
 from pydantic import BaseModel, Field, create_model
 
 
@@ -16,6 +20,12 @@ TYPE_MAPPING = {
     "json": dict,
 }
 
+# Largest page client.tools.list accepts
+TOOLKIT_PAGE_SIZE = 100
+
+# Argument models are shared by every tool (and tenant) with the same inputs
+MODEL_CACHE = LRUCache(maxsize=2048)
+
 
 def get_python_type(val_type: str) -> Any:
     """Map Arcade value types to Python types.
@@ -32,15 +42,37 @@ def get_python_type(val_type: str) -> Any:
     return _type
 
 
+def tool_definition_fingerprint(tool_def: ToolDefinition) -> str:
+    """Stable digest of the parts of a ToolDefinition that shape its model.
+
+    Args:
+        tool_def: The ToolDefinition to fingerprint.
+
+    Returns:
+        A hex digest of the tool name and its input parameters.
+    """
+    payload = tool_def.input.model_dump_json(exclude_none=True)
+    return hashlib.sha256(f"{tool_def.name}|{payload}".encode()).hexdigest()
+
+
 def tool_definition_to_pydantic_model(tool_def: ToolDefinition) -> type[BaseModel]:
     """Convert a ToolDefinition's inputs into a Pydantic BaseModel.
 
+    Models are memoized in MODEL_CACHE by schema fingerprint.
+
     Args:
         tool_def: The ToolDefinition object to convert.
 
     Returns:
         A Pydantic BaseModel class representing the tool's input schema.
     """
+    return MODEL_CACHE.get_or_create(
+        tool_definition_fingerprint(tool_def),
+        lambda: _create_pydantic_model(tool_def),
+    )
+
+
+def _create_pydantic_model(tool_def: ToolDefinition) -> type[BaseModel]:
     try:
         fields: dict[str, Any] = {}
         for param in tool_def.input.parameters or []:
@@ -61,17 +93,146 @@ def tool_definition_to_pydantic_model(tool_def: ToolDefinition) -> type[BaseMode
         )
 
 
+# Process-wide clients keyed by (base_url, api_key), see get_arcade_client
+_CLIENTS: dict[tuple[str, str], AsyncArcade] = {}
+
+
 def get_arcade_client(
-    base_url: str = "https://api.arcade.dev",
-    api_key: str = os.getenv("ARCADE_API_KEY", None),
+    base_url: str | None = None,
+    api_key: str | None = None,
+    max_connections: int = 100,
+    max_keepalive_connections: int = 20,
+    keepalive_expiry: float = 30.0,
+    timeout: float = 60.0,
+    connect_timeout: float = 5.0,
+    http2: bool | None = None,
     **kwargs: dict[str, Any],
 ) -> AsyncArcade:
     """
-    Returns an AsyncArcade client.
+    Returns the shared AsyncArcade client for (base_url, api_key).
+
+    The first call for a given key creates the client and its connection
+    pool; later calls reuse it and ignore the remaining settings, so every
+    tool execution shares warm keep-alive connections. HTTP/2 is enabled
+    when the optional ``h2`` package is installed, unless http2 says
+    otherwise. Call close_arcade_clients on shutdown.
+
+    base_url and api_key default to ARCADE_BASE_URL and ARCADE_API_KEY,
+    like AsyncArcade().
     """
+    base_url = base_url or os.getenv("ARCADE_BASE_URL",
+                                     "https://api.arcade.dev")
+    api_key = api_key or os.getenv("ARCADE_API_KEY")
     if api_key is None:
         raise ValueError("ARCADE_API_KEY is not set")
-    return AsyncArcade(base_url=base_url, api_key=api_key, **kwargs)
+    key = (base_url, api_key)
+    client = _CLIENTS.get(key)
+    if client is not None and not client.is_closed():
+        return client
+
+    if http2 is None:
+        http2 = importlib.util.find_spec("h2") is not None
+    http_client = httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+        follow_redirects=True,
+    )
+    client = AsyncArcade(base_url=base_url,
+                         api_key=api_key,
+                         http_client=http_client,
+                         **kwargs)
+    _CLIENTS[key] = client
+    return client
+
+
+async def close_arcade_clients() -> None:
+    """
+    Closes every client created by get_arcade_client.
+    """
+    clients = list(_CLIENTS.values())
+    _CLIENTS.clear()
+    await asyncio.gather(*[client.close() for client in clients])
+
+
+def _cache_key(client: AsyncArcade, key: str) -> str:
+    return f"{client.base_url}|{key}"
+
+
+async def _fetch_cached(
+    client: AsyncArcade,
+    cache: ToolDefinitionCache | None,
+    key: str,
+    fetch,
+) -> list[ToolDefinition]:
+    """
+    Serve ``key`` from the cache while fresh, otherwise call ``fetch`` and
+    store (or revalidate) what it returns.
+    """
+    if cache is None:
+        return await fetch()
+    key = _cache_key(client, key)
+    cached = cache.get(key)
+    if cached is not None and cached[1]:
+        return cached[0]
+    try:
+        definitions = await fetch()
+    except APIConnectionError:
+        # a stale definition beats failing to start while offline
+        if cached is None:
+            raise
+        return cached[0]
+    cache.put(key, definitions)
+    return definitions
+
+
+async def _get_tool(client: AsyncArcade, tool_id: str) -> list[ToolDefinition]:
+    return [await client.tools.get(name=tool_id)]
+
+
+async def _iter_toolkit_pages(
+    client: AsyncArcade,
+    toolkit: str,
+    page_size: int = TOOLKIT_PAGE_SIZE,
+) -> AsyncIterator[list[ToolDefinition]]:
+    """
+    Yields every page of a toolkit's tool definitions as it arrives.
+
+    The first page tells us the total count, the remaining pages are then
+    requested concurrently and yielded in completion order.
+    """
+    async def get_page(offset: int):
+        return await client.tools.list(toolkit=toolkit,
+                                       limit=page_size,
+                                       offset=offset)
+
+    first = await get_page(0)
+    yield first.items
+    # the server may clamp the page size, step by what it actually returned
+    step = len(first.items)
+    if not step or not first.total_count:
+        return
+    tasks = [asyncio.create_task(get_page(offset))
+             for offset in range(step, first.total_count, step)]
+    try:
+        for task in asyncio.as_completed(tasks):
+            page = await task
+            yield page.items
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _list_toolkit(client: AsyncArcade,
+                        toolkit: str) -> list[ToolDefinition]:
+    definitions: list[ToolDefinition] = []
+    async for page in _iter_toolkit_pages(client, toolkit):
+        definitions.extend(page)
+    return definitions
 
 
 async def _get_arcade_tool_formats(
@@ -79,6 +240,7 @@ async def _get_arcade_tool_formats(
     tools: list[str] | None = None,
     toolkits: list[str] | None = None,
     raise_on_empty: bool = True,
+    cache: ToolDefinitionCache | None = None,
 ) -> list[ToolDefinition]:
     """
     Asynchronously fetches tool definitions for each toolkit using client.tools.list,
@@ -89,6 +251,7 @@ async def _get_arcade_tool_formats(
         tools: Optional list of specific tool names to include.
         toolkits: Optional list of toolkit names to include all tools from.
         raise_on_empty: Whether to raise an error if no tools or toolkits are provided.
+        cache: Optional on-disk definition cache consulted before the network.
 
     Returns:
         A list of formatted tools respecting OpenAI's formatting.
@@ -102,24 +265,93 @@ async def _get_arcade_tool_formats(
     all_tool_formats: list[ToolDefinition] = []
     # Retrieve individual tools if specified
     if tools:
-        tasks = [client.tools.get(name=tool_id)
+        tasks = [_fetch_cached(client, cache, f"tool|{tool_id}",
+                               lambda tool_id=tool_id: _get_tool(client, tool_id))
                  for tool_id in tools]
         responses = await asyncio.gather(*tasks)
         for response in responses:
-            all_tool_formats.append(response)
+            all_tool_formats.extend(response)
 
     # Retrieve tools from specified toolkits
     if toolkits:
-        # Create a task for each toolkit to fetch its
+        # Create a task for each toolkit to fetch all of its pages of
         # tool definitions concurrently.
-        tasks = [client.tools.list(toolkit=tk)
+        tasks = [_fetch_cached(client, cache, f"toolkit|{tk}",
+                               lambda tk=tk: _list_toolkit(client, tk))
                  for tk in toolkits]
         responses = await asyncio.gather(*tasks)
 
         # Combine the tool definitions from each response.
         for response in responses:
-            # Here we assume the returned response has an "items" attribute
-            # containing a list of ToolDefinition objects.
-            all_tool_formats.extend(response.items)
+            all_tool_formats.extend(response)
 
     return all_tool_formats
+
+
+async def _iter_arcade_tool_formats(
+    client: AsyncArcade,
+    tools: list[str] | None = None,
+    toolkits: list[str] | None = None,
+    raise_on_empty: bool = True,
+    cache: ToolDefinitionCache | None = None,
+) -> AsyncIterator[list[ToolDefinition]]:
+    """
+    Streaming variant of _get_arcade_tool_formats, yields batches of tool
+    definitions as soon as each tool or toolkit page arrives.
+
+    Args:
+        client: AsyncArcade client
+        tools: Optional list of specific tool names to include.
+        toolkits: Optional list of toolkit names to include all tools from.
+        raise_on_empty: Whether to raise an error if no tools or toolkits are provided.
+        cache: Optional on-disk definition cache consulted before the network.
+    """
+    if not tools and not toolkits:
+        if raise_on_empty:
+            raise ValueError(
+                "No tools or toolkits provided to retrieve tool definitions")
+        return
+
+    queue: asyncio.Queue[list[ToolDefinition] | None] = asyncio.Queue()
+
+    async def produce_tool(tool_id: str):
+        await queue.put(await _fetch_cached(
+            client, cache, f"tool|{tool_id}",
+            lambda: _get_tool(client, tool_id)))
+
+    async def produce_toolkit(toolkit: str):
+        key = _cache_key(client, f"toolkit|{toolkit}")
+        cached = cache.get(key) if cache else None
+        if cached is not None and cached[1]:
+            await queue.put(cached[0])
+            return
+        definitions: list[ToolDefinition] = []
+        try:
+            async for page in _iter_toolkit_pages(client, toolkit):
+                definitions.extend(page)
+                await queue.put(page)
+        except APIConnectionError:
+            # as in _fetch_cached, serve the stale toolkit while offline,
+            # minus the tools already streamed
+            if cached is None:
+                raise
+            streamed = {d.fully_qualified_name for d in definitions}
+            await queue.put([d for d in cached[0]
+                             if d.fully_qualified_name not in streamed])
+            return
+        if cache:
+            cache.put(key, definitions)
+
+    producers = [asyncio.create_task(produce_tool(t)) for t in tools or []]
+    producers += [asyncio.create_task(produce_toolkit(tk))
+                  for tk in toolkits or []]
+    done = asyncio.gather(*producers)
+    done.add_done_callback(lambda _: queue.put_nowait(None))
+    try:
+        while (batch := await queue.get()) is not None:
+            yield batch
+        # surface any producer error
+        await done
+    finally:
+        for producer in producers:
+            producer.cancel()
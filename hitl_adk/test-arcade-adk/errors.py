@@ -2,13 +2,40 @@ from arcadepy.types.execute_tool_response import ExecuteToolResponse
 from arcadepy.types.shared.authorization_response import AuthorizationResponse
 
 
+# structured error kinds and upstream statuses meaning the user's
+# authorization is missing or was revoked
+AUTH_ERROR_KINDS = {"UPSTREAM_RUNTIME_AUTH_ERROR"}
+AUTH_STATUS_CODES = {401, 403}
+
+
 class ToolError(ValueError):
     def __init__(self, result: ExecuteToolResponse):
         self.result = result
 
     @property
     def message(self):
-        return self.result.output.error.message
+        output = self.result.output
+        if output is None or output.error is None:
+            return "no output"
+        return output.error.message
+
+    @property
+    def requires_authorization(self) -> bool:
+        """Whether the tool failed because its authorization is missing or
+        was revoked upstream, from the authorization status or the error's
+        kind and status code. Older arcadepy versions don't declare those
+        fields, they are read from the response as sent by the API."""
+        output = self.result.output
+        if output is None:
+            return False
+        if output.authorization and output.authorization.status != "completed":
+            return True
+        if output.error is None:
+            return False
+        kind = getattr(output.error, "kind", None)
+        if kind is not None:
+            return getattr(kind, "value", kind) in AUTH_ERROR_KINDS
+        return getattr(output.error, "status_code", None) in AUTH_STATUS_CODES
 
     def __str__(self):
         return f"Tool {self.result.tool_name} failed with error: {self.message}"
@@ -24,3 +51,16 @@ class AuthorizationError(PermissionError):
 
     def __str__(self):
         return self.message
+
+
+class CircuitOpenError(RuntimeError):
+    def __init__(self, toolkit: str):
+        self.toolkit = toolkit
+
+    @property
+    def message(self):
+        return (f"Calls to the {self.toolkit} toolkit are failing,"
+                " not retrying for now")
+
+    def __str__(self):
+        return self.message
@@ -0,0 +1,244 @@
+import asyncio
+import random
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+from arcadepy import APIConnectionError, InternalServerError, RateLimitError
+from arcadepy.types.execute_tool_response import ExecuteToolResponse
+from arcade_adk.errors import CircuitOpenError
+
+
+# Errors worth another attempt, APITimeoutError is an APIConnectionError.
+# Only a RateLimitError guarantees the call wasn't carried out, the others
+# are only retried for idempotent tools.
+RETRYABLE_ERRORS = (APIConnectionError, RateLimitError, InternalServerError)
+
+
+def toolkit_of(tool_name: str) -> str:
+    """Google_ListEmails and Google.ListEmails both belong to Google"""
+    return re.split(r"[._]", tool_name, maxsplit=1)[0]
+
+
+@dataclass
+class ExecutionStats:
+    """Attempt counts and recent latencies (seconds) of one tool"""
+
+    calls: int = 0
+    attempts: int = 0
+    retries: int = 0
+    hedges: int = 0
+    failures: int = 0
+    latencies: deque = field(default_factory=lambda: deque(maxlen=1024))
+
+    def summary(self) -> dict[str, Any]:
+        latencies = sorted(self.latencies)
+
+        def percentile(q: float) -> float | None:
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+        return {"calls": self.calls,
+                "attempts": self.attempts,
+                "retries": self.retries,
+                "hedges": self.hedges,
+                "failures": self.failures,
+                "p50": percentile(0.5),
+                "p99": percentile(0.99)}
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` consecutive failures and rejects calls
+    for ``reset_timeout`` seconds, then lets a single probe call through.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "half_open":
+            # only one probe, the others wait for its verdict
+            self.opened_at = time.monotonic()
+            return True
+        return state == "closed"
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+@dataclass
+class ExecutionPolicy:
+    """
+    How the ADK adapter runs client.tools.execute
+
+    A connection error or a 5xx may come after the server carried the call
+    out, so only idempotent_tools are sent again then, any tool is retried
+    after a 429 or a response with can_retry. The client must not retry on
+    its own (max_retries=0), ArcadeTool takes care of it.
+
+    Args:
+        max_attempts: attempts per call, including the first one.
+        base_delay: first backoff delay in seconds, doubled every retry and
+            fully jittered.
+        max_delay: upper bound for a single backoff delay.
+        deadline: seconds a call may take across all of its attempts.
+        hedge_after: seconds after which a duplicate request is raced
+            against a slow one, None disables hedging.
+        idempotent_tools: tools that can be sent again after a connection
+            error or a server error.
+        hedge_tools: idempotent read tools that may be hedged.
+        failure_threshold: consecutive failures that open a toolkit's circuit.
+        reset_timeout: seconds an open circuit waits before probing again.
+    """
+
+    max_attempts: int = 3
+    base_delay: float = 0.2
+    max_delay: float = 5.0
+    deadline: float | None = 30.0
+    hedge_after: float | None = None
+    idempotent_tools: frozenset[str] = frozenset({
+        "Google_ListEmails",
+        "Slack_ListUsers",
+    })
+    hedge_tools: frozenset[str] = frozenset({
+        "Google_ListEmails",
+        "Slack_ListUsers",
+    })
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+    stats: dict[str, ExecutionStats] = field(default_factory=dict)
+    breakers: dict[str, CircuitBreaker] = field(default_factory=dict)
+
+    def report(self) -> dict[str, dict[str, Any]]:
+        """Per-tool attempt counts and latency percentiles"""
+        return {name: stats.summary() for name, stats in self.stats.items()}
+
+    def _breaker(self, tool_name: str) -> CircuitBreaker:
+        toolkit = toolkit_of(tool_name)
+        if toolkit not in self.breakers:
+            self.breakers[toolkit] = CircuitBreaker(self.failure_threshold,
+                                                    self.reset_timeout)
+        return self.breakers[toolkit]
+
+    def _backoff(self, attempt: int, retry_after: float | None) -> float:
+        delay = random.uniform(0, min(self.max_delay,
+                                      self.base_delay * 2 ** (attempt - 1)))
+        return max(delay, retry_after or 0)
+
+    async def _hedged(self,
+                      call: Callable[[], Awaitable[ExecuteToolResponse]],
+                      stats: ExecutionStats) -> ExecuteToolResponse:
+        primary = asyncio.ensure_future(call())
+        pending = {primary}
+        # cancelled by the deadline or the caller, no request is left behind
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.hedge_after)
+            if done:
+                return primary.result()
+            stats.hedges += 1
+            pending.add(asyncio.ensure_future(call()))
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            # both failed, report the original request's error
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def run(self,
+                  tool_name: str,
+                  call: Callable[[], Awaitable[ExecuteToolResponse]],
+                  ) -> ExecuteToolResponse:
+        """
+        Run ``call`` under this policy
+
+        Raises:
+            CircuitOpenError: the tool's toolkit is failing, nothing was sent.
+            TimeoutError: the deadline passed before a usable response.
+        """
+        breaker = self._breaker(tool_name)
+        probe = breaker.state == "half_open"
+        if not breaker.allow():
+            raise CircuitOpenError(toolkit_of(tool_name))
+        stats = self.stats.setdefault(tool_name, ExecutionStats())
+        stats.calls += 1
+        idempotent = tool_name.replace(".", "_") in self.idempotent_tools
+        hedge = (self.hedge_after is not None
+                 and tool_name.replace(".", "_") in self.hedge_tools)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        expires = None if self.deadline is None else started + self.deadline
+
+        attempt = 0
+        while True:
+            stats.attempts += 1
+            retry_after = None
+            try:
+                attempt_call = self._hedged(call, stats) if hedge else call()
+                timeout = None if expires is None else expires - loop.time()
+                result = await asyncio.wait_for(attempt_call, timeout)
+                error = result.output.error if result.output else None
+                if result.success or not (error and error.can_retry):
+                    breaker.record_success()
+                    stats.latencies.append(loop.time() - started)
+                    return result
+                retry_after = (error.retry_after_ms or 0) / 1000
+                failure: Exception | ExecuteToolResponse = result
+            except RETRYABLE_ERRORS as e:
+                if isinstance(e, RateLimitError):
+                    header = e.response.headers.get("retry-after", "")
+                    retry_after = float(header) if header.isdigit() else None
+                elif not idempotent:
+                    # the call may have gone through, sending it again could
+                    # e.g. send the same email twice
+                    breaker.record_failure()
+                    stats.failures += 1
+                    raise
+                failure = e
+            except TimeoutError:
+                breaker.record_failure()
+                stats.failures += 1
+                raise
+            except Exception:
+                # a failed probe keeps the circuit open for another period
+                if probe:
+                    breaker.record_failure()
+                    stats.failures += 1
+                raise
+
+            attempt += 1
+            delay = self._backoff(attempt, retry_after)
+            out_of_time = expires is not None and loop.time() + delay >= expires
+            if attempt >= self.max_attempts or out_of_time:
+                breaker.record_failure()
+                stats.failures += 1
+                if isinstance(failure, Exception):
+                    raise failure
+                return failure
+            stats.retries += 1
+            await asyncio.sleep(delay)
@@ -1,13 +1,21 @@
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict
 from typing_extensions import override
 from arcadepy import AsyncArcade
 from arcadepy.types import ToolDefinition
+from arcade_adk._cache import (
+    AuthorizationCache,
+    LRUCache,
+    ResultCache,
+    ToolDefinitionCache,
+)
 from arcade_adk._utils import (
     _get_arcade_tool_formats,
+    _iter_arcade_tool_formats,
     tool_definition_to_pydantic_model,
     get_arcade_client,
 )
 from arcade_adk.errors import AuthorizationError, ToolError
+from arcade_adk.execution import ExecutionPolicy
 from google.adk.tools import (ToolContext, FunctionTool)
 # TODO: This relies on "private" functions for schema adherence, update when
 # stable for Google
@@ -15,20 +23,39 @@ from google.adk.tools._automatic_function_calling_util import (
     _map_pydantic_type_to_property_schema
 )
 from google.genai import types
+from pydantic import BaseModel
+
+# JSON schemas keyed by (memoized) argument model, shared by all ArcadeTools
+SCHEMA_CACHE = LRUCache(maxsize=2048)
+
+# Completed authorizations, shared by all ArcadeTools unless one is passed in
+AUTH_CACHE = AuthorizationCache()
+
+
+def _model_to_property_schema(model: type[BaseModel]) -> dict[str, Any]:
+    schema = model.model_json_schema()
+    _map_pydantic_type_to_property_schema(schema)
+    return schema
 
 
 async def _authorize_tool(client: AsyncArcade,
                           tool_context: ToolContext,
-                          tool_name: str):
-    if not tool_context.state.get("user_id"):
+                          tool_name: str,
+                          auth_cache: AuthorizationCache):
+    user_id = tool_context.state.get("user_id")
+    if not user_id:
         raise ValueError("No user ID and authorization required for tool")
+    if auth_cache.is_authorized(user_id, tool_name):
+        return
 
     result = await client.tools.authorize(
         tool_name=tool_name,
-        user_id=tool_context.state.get("user_id"),
+        user_id=user_id,
     )
     if result.status != "completed":
+        auth_cache.invalidate(user_id, tool_name)
         raise AuthorizationError(result)
+    auth_cache.mark_authorized(user_id, tool_name, result.provider_id)
 
 
 async def _async_invoke_arcade_tool(
@@ -37,19 +64,41 @@ async def _async_invoke_arcade_tool(
     tool_name: str,
     requires_auth: bool,
     client: AsyncArcade,
+    auth_cache: AuthorizationCache = AUTH_CACHE,
+    policy: ExecutionPolicy | None = None,
+    result_cache: ResultCache | None = None,
+    execute_client: AsyncArcade | None = None,
 ) -> Dict:
+    user_id = tool_context.state.get("user_id")
+    if result_cache is not None:
+        cached = result_cache.get(user_id, tool_name, tool_args)
+        if cached is not ResultCache.MISS:
+            return cached
+
     if requires_auth:
-        await _authorize_tool(client, tool_context, tool_name)
+        await _authorize_tool(client, tool_context, tool_name, auth_cache)
 
-    result = await client.tools.execute(
-        tool_name=tool_name,
-        input=tool_args,
-        user_id=tool_context.state.get("user_id"),
-    )
+    async def execute():
+        return await (execute_client or client).tools.execute(
+            tool_name=tool_name,
+            input=tool_args,
+            user_id=user_id,
+        )
+
+    if policy is None:
+        result = await execute()
+    else:
+        result = await policy.run(tool_name, execute)
 
     if not result.success:
-        raise ToolError(result)
+        error = ToolError(result)
+        if requires_auth and error.requires_authorization:
+            # the cached grant is no longer valid, ask again next time
+            auth_cache.invalidate(user_id, tool_name)
+        raise error
 
+    if result_cache is not None:
+        result_cache.record(user_id, tool_name, tool_args, result.output.value)
     return result.output.value
 
 
@@ -57,9 +106,28 @@ class ArcadeTool(FunctionTool):
     def __init__(self,
                  name: str,
                  description: str,
-                 schema: ToolDefinition,
+                 schema: type[BaseModel] | None,
                  client: AsyncArcade,
-                 requires_auth: bool):
+                 requires_auth: bool,
+                 auth_cache: AuthorizationCache = AUTH_CACHE,
+                 definition: ToolDefinition | None = None,
+                 policy: ExecutionPolicy | None = None,
+                 result_cache: ResultCache | None = None):
+        """
+        Args:
+            schema: the tool's argument model. Pass None together with
+                definition to build it lazily on first use.
+            definition: the ToolDefinition used to build the argument model,
+                property schema and declaration the first time they are needed.
+            policy: retry, deadline, hedging and circuit breaking applied to
+                client.tools.execute, None makes a single attempt. The client
+                doesn't retry on its own under a policy.
+            result_cache: opt-in cache for the results of read-only tools.
+        """
+
+        # the policy decides what is sent again, the copy shares the connections
+        execute_client = (client if policy is None
+                          else client.with_options(max_retries=0))
 
         # define callable
         async def func(tool_context: ToolContext,
@@ -69,30 +137,57 @@ class ArcadeTool(FunctionTool):
                 tool_args=kwargs,
                 tool_name=name,
                 requires_auth=requires_auth,
-                client=client
+                client=client,
+                auth_cache=auth_cache,
+                policy=policy,
+                result_cache=result_cache,
+                execute_client=execute_client,
             )
         func.__name__ = name.lower()
         func.__doc__ = description
 
         super().__init__(func)
-        schema = schema.model_json_schema()
-        _map_pydantic_type_to_property_schema(schema)
-        self.schema = schema
         self.name = name
         self.description = description
         self.client = client
         self.requires_auth = requires_auth
+        self.auth_cache = auth_cache
+        self.policy = policy
+        self.result_cache = result_cache
+        self._model = schema
+        self._definition = definition
+        self._schema: dict[str, Any] | None = None
+        self._declaration: types.FunctionDeclaration | None = None
+        if definition is None:
+            # eager mode, build the schema right away
+            self.schema
+
+    @property
+    def schema(self) -> dict[str, Any]:
+        """The tool's property schema, built on first access"""
+        if self._schema is None:
+            model = self._model or tool_definition_to_pydantic_model(
+                self._definition)
+            self._schema = SCHEMA_CACHE.get_or_create(
+                model, lambda: _model_to_property_schema(model))
+            # nothing else needs these once the schema exists
+            self._model = None
+            self._definition = None
+        return self._schema
 
     @override
     def _get_declaration(self) -> types.FunctionDeclaration:
-        return types.FunctionDeclaration(
-            parameters=types.Schema(
-                type='OBJECT',
-                properties=self.schema["properties"],
-            ),
-            description=self.description,
-            name=self.name,
-        )
+        # ADK asks for this on every LLM request, the tool never changes
+        if self._declaration is None:
+            self._declaration = types.FunctionDeclaration(
+                parameters=types.Schema(
+                    type='OBJECT',
+                    properties=self.schema["properties"],
+                ),
+                description=self.description,
+                name=self.name,
+            )
+        return self._declaration
 
 
 async def get_arcade_tools(
@@ -100,6 +195,11 @@ async def get_arcade_tools(
     tools: list[str] | None = None,
     toolkits: list[str] | None = None,
     raise_on_empty: bool = True,
+    cache: ToolDefinitionCache | None = None,
+    auth_cache: AuthorizationCache = AUTH_CACHE,
+    lazy: bool = False,
+    policy: ExecutionPolicy | None = None,
+    result_cache: ResultCache | None = None,
     **kwargs: dict[str, Any],
 ) -> list[ArcadeTool]:
     """
@@ -112,6 +212,14 @@ async def get_arcade_tools(
         tools: Optional list of specific tool names to include.
         toolkits: Optional list of toolkit names to include all tools from.
         raise_on_empty: Whether to raise an error if no tools or toolkits are provided.
+        cache: Optional on-disk definition cache, warm starts skip the network
+        auth_cache: cache of completed authorizations checked before each call
+        lazy: defer building each tool's model, schema and declaration until
+            they are first needed. ADK asks for every tool's declaration on
+            the first LLM request, so this moves the cost from startup to
+            the first turn, it doesn't skip tools that are never called
+        policy: execution policy shared by the returned tools
+        result_cache: opt-in cache for the results of read-only tools
         kwargs: if a client is not provided, these parameters will initialize it
 
     Returns:
@@ -130,18 +238,76 @@ async def get_arcade_tools(
         client,
         tools=tools,
         toolkits=toolkits,
-        raise_on_empty=raise_on_empty)
-
-    tool_functions = []
-    for tool in tool_formats:
-        requires_auth = bool(tool.requirements and tool.requirements.authorization)
-        tool_function = ArcadeTool(
-            name=tool.qualified_name,
-            description=tool.description,
-            schema=tool_definition_to_pydantic_model(tool),
-            requires_auth=requires_auth,
-            client=client
-        )
-        tool_functions.append(tool_function)
+        raise_on_empty=raise_on_empty,
+        cache=cache)
 
-    return tool_functions
+    return [_tool_from_definition(tool, client, auth_cache, lazy, policy,
+                                  result_cache)
+            for tool in tool_formats]
+
+
+async def iter_arcade_tools(
+    client: AsyncArcade | None = None,
+    tools: list[str] | None = None,
+    toolkits: list[str] | None = None,
+    raise_on_empty: bool = True,
+    cache: ToolDefinitionCache | None = None,
+    auth_cache: AuthorizationCache = AUTH_CACHE,
+    lazy: bool = False,
+    policy: ExecutionPolicy | None = None,
+    result_cache: ResultCache | None = None,
+    **kwargs: dict[str, Any],
+) -> AsyncIterator[ArcadeTool]:
+    """
+    Streaming variant of get_arcade_tools, yields each ArcadeTool as soon as
+    its definition (or the toolkit page holding it) arrives, so agents can
+    start registering tools before large toolkits finish loading.
+
+    Args:
+        client: AsyncArcade client
+        tools: Optional list of specific tool names to include.
+        toolkits: Optional list of toolkit names to include all tools from.
+        raise_on_empty: Whether to raise an error if no tools or toolkits are provided.
+        cache: Optional on-disk definition cache, warm starts skip the network
+        auth_cache: cache of completed authorizations checked before each call
+        lazy: defer building each tool's model, schema and declaration until
+            they are first needed. ADK asks for every tool's declaration on
+            the first LLM request, so this moves the cost from startup to
+            the first turn, it doesn't skip tools that are never called
+        policy: execution policy shared by the returned tools
+        result_cache: opt-in cache for the results of read-only tools
+        kwargs: if a client is not provided, these parameters will initialize it
+    """
+    if not client:
+        client = get_arcade_client(**kwargs)
+
+    async for batch in _iter_arcade_tool_formats(
+            client,
+            tools=tools,
+            toolkits=toolkits,
+            raise_on_empty=raise_on_empty,
+            cache=cache):
+        for tool in batch:
+            yield _tool_from_definition(tool, client, auth_cache, lazy,
+                                        policy, result_cache)
+
+
+def _tool_from_definition(tool: ToolDefinition,
+                          client: AsyncArcade,
+                          auth_cache: AuthorizationCache,
+                          lazy: bool = False,
+                          policy: ExecutionPolicy | None = None,
+                          result_cache: ResultCache | None = None,
+                          ) -> ArcadeTool:
+    requires_auth = bool(tool.requirements and tool.requirements.authorization)
+    return ArcadeTool(
+        name=tool.qualified_name,
+        description=tool.description,
+        schema=None if lazy else tool_definition_to_pydantic_model(tool),
+        requires_auth=requires_auth,
+        client=client,
+        auth_cache=auth_cache,
+        definition=tool if lazy else None,
+        policy=policy,
+        result_cache=result_cache,
+    )
@@ -6,15 +6,28 @@ from langchain_arcade import ToolManager
 from langchain.chat_models import init_chat_model
 from langchain_core.tools import tool, BaseTool
 from langchain_core.runnables import RunnableConfig
-from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt import create_react_agent
 from langgraph_supervisor import create_supervisor
 from langgraph.types import interrupt, Command
 
-from utils.hitl_commons import yes_no_loop
+from hitl_shared.approvals import (ApprovalBroker, ApprovalMemo,
+                                   HttpApprovalBackend, get_approval_broker)
+from hitl_shared.durable import DurableStore
+from hitl_shared.metrics import HitlMetrics, HttpMetricsBackend
+from hitl_shared.policy import (APPROVE, DEFAULT_RULES, DENY, ApprovalPolicy,
+                                Limit, Rule, recipient_domain_in)
+from hitl_shared.prompt_cache import PromptCacheStats, sort_by_name
+from hitl_shared.result_cache import ResultCache
+from utils.checkpoint import AsyncFileSaver
+from utils.metrics import MetricsHandler
+from utils.prompt_cache import PromptCacheHandler
+from utils.scheduler import HttpThreadBackend, ThreadScheduler
+from utils.tool_cache import add_result_cache
 # import agentops
+import asyncio
 import pprint
+import sys
 
 from dotenv import load_dotenv
 
@@ -27,10 +40,65 @@ AGENTOPS_API_KEY = os.getenv("AGENTOPS_API_KEY")
 arcade_api_key = os.environ["ARCADE_API_KEY"]
 
 
+def review_tool_call(target_tool: BaseTool,
+                     policy: ApprovalPolicy,
+                     memo: ApprovalMemo | None,
+                     config: RunnableConfig,
+                     tool_input: dict[str, Any]) -> str | None:
+    """
+    Decide a tool call: by policy, by an earlier decision in the thread, or
+    by interrupting the graph for a human
+
+    An interrupt re-runs the task of the call on resume, so the agents have
+    to run each tool call in its own task (create_react_agent version
+    "v2"). Otherwise calls approved here next to an interrupted sibling
+    would run twice.
+
+    Returns:
+        None if the call may run, otherwise what the tool returns instead
+    """
+    decision = policy.decide(config["configurable"]["user_id"],
+                             target_tool.name, tool_input)
+    if decision.action == APPROVE:
+        return None
+    if decision.action == DENY:
+        return (f"The call to {target_tool.name} is not allowed:"
+                f" {decision.reason}")
+    if memo is not None:
+        remembered = memo.lookup(config["configurable"]["thread_id"],
+                                 target_tool.name, tool_input)
+        if remembered is not None:
+            return (None if remembered
+                    else "The User did not allow the tool to run")
+
+    arguments = pprint.pformat(tool_input, indent=4)
+    response = interrupt({
+        "tool_name": target_tool.name,
+        "args": tool_input,
+        "description": f"Do you allow the call to {target_tool.name}"
+                       f" with arguments:\n{arguments}",
+    })
+
+    # approve the tool call
+    if response == "yes":
+        return None
+    # deny tool call
+    elif response == "no":
+        return "The User did not allow the tool to run"
+    else:
+        raise ValueError(
+            f"Unsupported interrupt response type: {response}"
+        )
+
+
 def add_human_in_the_loop(
     target_tool: Callable | BaseTool,
+    policy: ApprovalPolicy,
+    memo: ApprovalMemo | None = None,
 ) -> BaseTool:
-    """Wrap a tool to support human-in-the-loop review."""
+    """Wrap a tool to support human-in-the-loop review, calls the policy
+    approves or denies on its own, or that were already decided in the
+    thread according to the memo, skip the review."""
     if not isinstance(target_tool, BaseTool):
         target_tool = tool(target_tool)
 
@@ -40,62 +108,263 @@ def add_human_in_the_loop(
         args_schema=target_tool.args_schema
     )
     def call_tool_with_interrupt(config: RunnableConfig, **tool_input):
+        denied = review_tool_call(target_tool, policy, memo, config,
+                                  tool_input)
+        if denied is not None:
+            return denied
+        return target_tool.invoke(tool_input, config)
 
-        arguments = pprint.pformat(tool_input, indent=4)
-        response = interrupt(
-            f"Do you allow the call to {target_tool.name} with arguments:\n"
-            f"{arguments}"
-        )
-
-        # approve the tool call
-        if response == "yes":
-            tool_response = target_tool.invoke(tool_input, config)
-        # deny tool call
-        elif response == "no":
-            tool_response = "The User did not allow the tool to run"
-        else:
-            raise ValueError(
-                f"Unsupported interrupt response type: {response}"
-            )
+    return call_tool_with_interrupt
 
-        return tool_response
 
-    return call_tool_with_interrupt
+def add_async_human_in_the_loop(
+    target_tool: Callable | BaseTool,
+    policy: ApprovalPolicy,
+    memo: ApprovalMemo | None = None,
+) -> BaseTool:
+    """Async variant of add_human_in_the_loop, the tool runs with ainvoke
+    so calls don't hold a worker thread and the parallel tool calls of a
+    step overlap. The graph has to be run with astream/ainvoke."""
+    if not isinstance(target_tool, BaseTool):
+        target_tool = tool(target_tool)
 
+    @tool(
+        target_tool.name,
+        description=target_tool.description,
+        args_schema=target_tool.args_schema
+    )
+    async def call_tool_with_interrupt(config: RunnableConfig, **tool_input):
+        denied = review_tool_call(target_tool, policy, memo, config,
+                                  tool_input)
+        if denied is not None:
+            return denied
+        return await target_tool.ainvoke(tool_input, config)
 
-ENFORCE_HUMAN_CONFIRMATION = [
-    "Google_SendEmail",
-    "Slack_SendDmToUser",
-]
+    return call_tool_with_interrupt
 
 
-def run_graph(graph: CompiledStateGraph, config, input: Any):
-    for event in graph.stream(input, config=config, stream_mode="values"):
+async def run_graph(graph: CompiledStateGraph, config, input: Any):
+    async for event in graph.astream(input, config=config,
+                                     stream_mode="values"):
         if "messages" in event:
             # Pretty-print the last message
             event["messages"][-1].pretty_print()
 
 
-def handle_interrupts(graph: CompiledStateGraph, config):
-    for interr in graph.get_state(config).interrupts:
-        approved = yes_no_loop(interr.value)
-        run_graph(graph, config, Command(resume=approved))
-
-
-if __name__ == "__main__":
+def describe_interrupt(value: Any) -> tuple[str, Any]:
+    """Tool name and arguments behind an interrupt, as raised by
+    add_human_in_the_loop or in the HumanInterrupt format"""
+    if isinstance(value, dict) and "tool_name" in value:
+        return value["tool_name"], value["args"]
+    if isinstance(value, list) and value and "action_request" in value[0]:
+        action = value[0]["action_request"]
+        return action["action"], action["args"]
+    return "a tool", value
+
+
+async def decide_interrupts(interrupts,
+                            config,
+                            broker: ApprovalBroker,
+                            policy: ApprovalPolicy) -> Command:
+    """
+    Hand interrupts to the approval broker and wait for every decision. The
+    thread is the broker session and the interrupt id the call id, so
+    reviewers can answer from any backend, and interrupts raised by the
+    same step are reviewed together. Grants given by the reviewers are
+    recorded in the policy.
+
+    Returns:
+        Command: resumes all of the interrupts at once
+    """
+    thread_id = config["configurable"]["thread_id"]
+    user_id = config["configurable"]["user_id"]
+    requests = []
+    for interr in interrupts:
+        tool_name, args = describe_interrupt(interr.value)
+        # the deadline and default action of the rule that escalated it
+        decision = policy.decide(user_id, tool_name, args, consume=False)
+        requests.append(broker.submit(tool_name, args,
+                                      session_id=thread_id,
+                                      call_id=interr.interrupt_id,
+                                      deadline=decision.deadline,
+                                      on_timeout=decision.on_timeout))
+    decisions = await asyncio.gather(*[r.future for r in requests])
+    for request, approved in zip(requests, decisions):
+        if approved and request.grant_minutes:
+            policy.grant(user_id, request.tool_name, request.args,
+                         request.grant_minutes)
+    return Command(resume={interr.interrupt_id: "yes" if approved else "no"
+                           for interr, approved in zip(interrupts, decisions)})
+
+
+async def approve_interrupts(graph: CompiledStateGraph,
+                             config,
+                             broker: ApprovalBroker,
+                             policy: ApprovalPolicy):
+    """
+    Hand the thread's interrupts to the approval broker and resume the graph
+    once with all of the decisions, see decide_interrupts.
+    """
+    interrupts = (await graph.aget_state(config)).interrupts
+    if not interrupts:
+        return
+    await run_graph(graph, config,
+                    await decide_interrupts(interrupts, config, broker,
+                                            policy))
+
+
+async def serve(graph: CompiledStateGraph,
+                checkpointer: AsyncFileSaver,
+                broker: ApprovalBroker,
+                policy: ApprovalPolicy,
+                authorize: Callable[[str], Any],
+                default_user_id: str,
+                cache_stats: PromptCacheStats | None = None,
+                callbacks: list | None = None,
+                workers: int = 8):
+    """
+    Serve many threads of one compiled graph over HTTP until cancelled.
+
+    Turns run on a ThreadScheduler. When a turn ends on interrupts, the
+    thread is parked and its interrupts go to the broker. The thread
+    holds no worker while it waits, and the decisions resume it through
+    the scheduler. Threads left waiting by an earlier run are parked
+    again on start.
+
+    Args:
+        authorize: called in a worker thread the first time a user is seen
+        default_user_id: user of messages that don't name one
+        cache_stats: the prompt cache hits of every turn are returned with
+            it, its PromptCacheHandler has to be in callbacks
+        callbacks: LangChain callbacks of every run, e.g. metrics
+        workers: turns running at the same time
+    """
+    users: dict[str, str] = {}
+    authorized: set[str] = set()
+    waiting: set[asyncio.Task] = set()
+    callbacks = callbacks or []
+
+    def config_for(thread_id: str) -> dict:
+        return {"configurable": {"thread_id": thread_id,
+                                 "user_id": users[thread_id]},
+                "callbacks": callbacks}
+
+    def wait_for_decisions(thread_id: str, interrupts) -> None:
+        scheduler.park(thread_id)
+
+        async def resume():
+            try:
+                command = await decide_interrupts(
+                    interrupts, config_for(thread_id), broker, policy)
+            except Exception as e:
+                # don't leave the thread parked for good
+                print(f"thread {thread_id}: approvals failed: {e!r}")
+                scheduler.fail(thread_id, e)
+                return
+            scheduler.resume(thread_id, command)
+
+        task = asyncio.create_task(resume())
+        waiting.add(task)
+        task.add_done_callback(waiting.discard)
+
+    async def run_turn(thread_id: str, input: Any) -> dict:
+        if isinstance(input, dict):
+            user_id = input["user_id"] or users.get(thread_id,
+                                                    default_user_id)
+            scheduler.bind(thread_id, user_id)
+            if user_id not in authorized:
+                await asyncio.to_thread(authorize, user_id)
+                authorized.add(user_id)
+            users[thread_id] = user_id
+            input = {"messages": [{"role": "user",
+                                   "content": input["content"]}]}
+        config = config_for(thread_id)
+        reply = None
+        async for event in graph.astream(input, config=config,
+                                         stream_mode="values"):
+            if "messages" in event:
+                reply = event["messages"][-1].content
+        interrupts = (await graph.aget_state(config)).interrupts
+        if interrupts:
+            wait_for_decisions(thread_id, interrupts)
+        result = {
+            "reply": reply,
+            "waiting_for_approval": [
+                describe_interrupt(interr.value)[0] for interr in interrupts],
+        }
+        if cache_stats is not None:
+            turn = cache_stats.end_turn(thread_id)
+            result["prompt_tokens"] = turn.prompt_tokens
+            result["cached_tokens"] = turn.cached_tokens
+        return result
+
+    scheduler = ThreadScheduler(run_turn, workers=workers)
+    scheduler.start()
+    for thread_id in list(checkpointer.storage):
+        state = await graph.aget_state({"configurable": {
+            "thread_id": thread_id}})
+        # threads stay with the user they had before the restart
+        users[thread_id] = state.metadata.get("user_id", default_user_id)
+        scheduler.bind(thread_id, users[thread_id])
+        if state.interrupts:
+            wait_for_decisions(thread_id, state.interrupts)
+
+    threads_http = HttpThreadBackend(scheduler,
+                                     default_user_id=default_user_id)
+    await threads_http.start()
+    print(f"Serving threads on http://{threads_http.host}:"
+          f"{threads_http.port}/threads")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await threads_http.close()
+        for task in waiting:
+            task.cancel()
+        await scheduler.close()
+
+
+async def main():
     user_id = "mateo@arcade.dev"
+    # every model call reports its prompt cache hits, and a warning if an
+    # agent's prompt prefix changed
+    cache_stats = PromptCacheStats()
+    # latency and tokens per agent, tool and handoff, for Prometheus at
+    # http://127.0.0.1:9464/metrics
+    metrics = HitlMetrics()
+    callbacks = [PromptCacheHandler(cache_stats), MetricsHandler(metrics)]
     config = {"configurable": {"thread_id": "4",
-                               "user_id": user_id}}
-    # Set up memory for checkpointing the state
-    memory = MemorySaver()
+                               "user_id": user_id},
+              "callbacks": callbacks}
+    # Set up memory for checkpointing the state, kept on disk so threads
+    # waiting on an approval survive a restart
+    store = DurableStore()
+    memory = AsyncFileSaver()
 
     # Initialize google tools
     manager = ToolManager(api_key=arcade_api_key)
     manager.init_tools(tools=["Google_ListEmails", "Google_SendEmail",
                               "Slack_ListUsers", "Slack_SendDmToUser"])
 
-    for t in manager.tools:
-        manager.authorize(tool_name=t, user_id=user_id)
+    def authorize(user: str):
+        for t in manager.tools:
+            manager.authorize(tool_name=t, user_id=user)
+
+    authorize(user_id)
+
+    # read-only results are reused until a write tool runs for the user
+    result_cache = ResultCache()
+    # internal email (up to 20 a day) doesn't need a human
+    policy = ApprovalPolicy(
+        rules=[Rule("Google_SendEmail", APPROVE,
+                    when=recipient_domain_in("arcade.dev"),
+                    name="internal email"),
+               *DEFAULT_RULES],
+        limits=[Limit("Google_SendEmail", max_calls=20, period=24 * 60 * 60)],
+    )
+
+    # decisions are remembered per thread, repeated calls aren't asked again
+    broker = get_approval_broker()
+    broker.persist_to(store)
 
     # separate tools for multiple agents
     google_tools = []
@@ -103,33 +372,42 @@ if __name__ == "__main__":
     for t in manager.to_langchain(use_interrupts=True):
         print(t.name)
         if t.name.startswith("Google"):
-            if t.name in ENFORCE_HUMAN_CONFIRMATION:
+            if not policy.always_approves(t.name):
                 print(f"Adding hitl to {t.name}")
-                google_tools.append(add_human_in_the_loop(t))
+                google_tools.append(add_result_cache(
+                    add_async_human_in_the_loop(t, policy, broker.memo),
+                    result_cache))
             else:
-                google_tools.append(t)
+                google_tools.append(add_result_cache(t, result_cache))
         if t.name.startswith("Slack"):
-            if t.name in ENFORCE_HUMAN_CONFIRMATION:
+            if not policy.always_approves(t.name):
                 print(f"Adding hitl to {t.name}")
-                slack_tools.append(add_human_in_the_loop(t))
+                slack_tools.append(add_result_cache(
+                    add_async_human_in_the_loop(t, policy, broker.memo),
+                    result_cache))
             else:
-                slack_tools.append(t)
+                slack_tools.append(add_result_cache(t, result_cache))
 
     google_agent = create_react_agent(
         model="openai:gpt-4o",
-        tools=google_tools,
+        # one order of the tool schemas, so the prompt prefix is stable
+        tools=sort_by_name(google_tools),
         prompt="You are a helpful assistant that can assist using tools"
                " to manage a Google account, contacts, and inbox.",
-        name="google_agent"
+        name="google_agent",
+        # one task per tool call: when a call interrupts, its siblings that
+        # already ran aren't run again on resume
+        version="v2",
     )
 
     slack_agent = create_react_agent(
         model="openai:gpt-4o",
-        tools=slack_tools,
+        tools=sort_by_name(slack_tools),
         prompt="You are a helpful assistant that can assist using tools"
                " to interact with Slack."
                " You have tools to manage channels and send DMs.",
-        name="slack_agent"
+        name="slack_agent",
+        version="v2",
     )
 
     conversation_agent = create_supervisor(
@@ -144,14 +422,45 @@ if __name__ == "__main__":
         output_mode="full_history",
     ).compile(checkpointer=memory)
 
-    while True:
-
-        user_input = input("User: ")
-        if user_input.lower() == "exit":
-            break
+    # reviewers can answer approvals over HTTP as well as on the console
+    approvals_http = HttpApprovalBackend(broker)
+    await approvals_http.start()
+    metrics_http = HttpMetricsBackend(metrics.registry)
+    await metrics_http.start()
+
+    try:
+        if "--serve" in sys.argv:
+            await serve(conversation_agent, memory, broker, policy,
+                        authorize=authorize, default_user_id=user_id,
+                        cache_stats=cache_stats, callbacks=callbacks)
+            return
+
+        # the thread may have been waiting on approvals before a restart
+        await approve_interrupts(conversation_agent, config, broker, policy)
+
+        while True:
+
+            user_input = await asyncio.to_thread(input, "User: ")
+            if user_input.lower() == "exit":
+                # nothing is left waiting on approvals of the ended thread
+                broker.close_session(config["configurable"]["thread_id"])
+                break
+
+            user_message = {"messages": [{"role": "user",
+                                          "content": user_input}]}
+            await run_graph(conversation_agent, config, user_message)
+
+            # handle all interrupts in case there's any
+            await approve_interrupts(conversation_agent, config, broker,
+                                     policy)
+            turn = cache_stats.end_turn(config["configurable"]["thread_id"])
+            print(f"### prompt cache: {turn}")
+    finally:
+        await approvals_http.close()
+        await metrics_http.close()
+        await memory.aflush()
+        store.close()
 
-        user_message = {"messages": [{"role": "user", "content": user_input}]}
-        run_graph(conversation_agent, config, user_message)
 
-        # handle all interrupts in case there's any
-        handle_interrupts(conversation_agent, config)
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+"""
+Tool calls of one model turn decided differently: the ones allowed without
+a human must run once, also when a sibling interrupts and the graph is
+resumed.
+
+Run from hitl_langgraph with: python -m unittest discover tests
+"""
+import os
+import unittest
+
+os.environ.setdefault("ARCADE_API_KEY", "test")
+
+from langchain_core.language_models.fake_chat_models import (  # noqa: E402
+    GenericFakeChatModel)
+from langchain_core.messages import AIMessage  # noqa: E402
+from langchain_core.tools import tool  # noqa: E402
+from langgraph.checkpoint.memory import InMemorySaver  # noqa: E402
+from langgraph.prebuilt import create_react_agent  # noqa: E402
+from langgraph.types import Command  # noqa: E402
+
+from hitl_shared.approvals import RECIPIENT, ApprovalMemo  # noqa: E402
+from hitl_shared.policy import (APPROVE, DEFAULT_RULES,  # noqa: E402
+                                ApprovalPolicy, Limit, Rule,
+                                recipient_domain_in)
+from main import add_async_human_in_the_loop  # noqa: E402
+
+
+class ToolCallingFakeModel(GenericFakeChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+def model_calling(*tool_calls: dict) -> ToolCallingFakeModel:
+    """A model asking for all of the tool calls in one turn, then done"""
+    return ToolCallingFakeModel(messages=iter([
+        AIMessage(content="", tool_calls=[
+            {"name": call["name"], "args": call["args"],
+             "id": f"call_{i}", "type": "tool_call"}
+            for i, call in enumerate(tool_calls)]),
+        AIMessage(content="done"),
+    ]))
+
+
+class ReviewToolCallReplayTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.sent: list[str] = []
+
+        @tool("Google_SendEmail")
+        def send_email(recipient: str) -> str:
+            """Send an email"""
+            self.sent.append(recipient)
+            return f"sent to {recipient}"
+
+        @tool("Slack_SendDmToUser")
+        def send_dm(user_name: str, message: str) -> str:
+            """Send a Slack DM"""
+            self.sent.append(user_name)
+            return f"sent to {user_name}"
+
+        self.send_email = send_email
+        self.send_dm = send_dm
+        self.config = {"configurable": {"thread_id": "t", "user_id": "u"}}
+
+    async def run_until_interrupt(self, graph, message: str):
+        await graph.ainvoke({"messages": [("user", message)]}, self.config)
+        return (await graph.aget_state(self.config)).interrupts
+
+    async def test_approved_sibling_of_an_interrupt_runs_once(self):
+        policy = ApprovalPolicy(
+            rules=[Rule("Google_SendEmail", APPROVE,
+                        when=recipient_domain_in("arcade.dev")),
+                   *DEFAULT_RULES],
+            limits=[Limit("Google_SendEmail", max_calls=20, period=60)])
+        graph = create_react_agent(
+            model_calling(
+                {"name": "Google_SendEmail",
+                 "args": {"recipient": "me@arcade.dev"}},
+                {"name": "Google_SendEmail",
+                 "args": {"recipient": "eve@example.com"}}),
+            tools=[add_async_human_in_the_loop(self.send_email, policy)],
+            checkpointer=InMemorySaver(),
+            version="v2")
+
+        interrupts = await self.run_until_interrupt(graph, "send both")
+        self.assertEqual(len(interrupts), 1)
+        self.assertEqual(self.sent, ["me@arcade.dev"])
+
+        await graph.ainvoke(
+            Command(resume={interrupts[0].interrupt_id: "yes"}), self.config)
+        self.assertEqual(sorted(self.sent),
+                         ["eve@example.com", "me@arcade.dev"])
+        # the automatic approval was counted against the limit once
+        self.assertEqual([len(calls) for calls in policy._calls.values()],
+                         [1])
+
+
+    async def test_remembered_sibling_of_an_interrupt_runs_once(self):
+        memo = ApprovalMemo(scopes={"Slack_SendDmToUser": RECIPIENT})
+        # approved earlier in the thread
+        memo.remember("t", "Slack_SendDmToUser",
+                      {"user_name": "alice", "message": "hi"}, True)
+        graph = create_react_agent(
+            model_calling(
+                {"name": "Slack_SendDmToUser",
+                 "args": {"user_name": "alice", "message": "again"}},
+                {"name": "Slack_SendDmToUser",
+                 "args": {"user_name": "bob", "message": "hi"}}),
+            tools=[add_async_human_in_the_loop(self.send_dm,
+                                               ApprovalPolicy(), memo)],
+            checkpointer=InMemorySaver(),
+            version="v2")
+
+        interrupts = await self.run_until_interrupt(graph, "message both")
+        self.assertEqual(len(interrupts), 1)
+        self.assertEqual(self.sent, ["alice"])
+
+        await graph.ainvoke(
+            Command(resume={interrupts[0].interrupt_id: "yes"}), self.config)
+        self.assertEqual(sorted(self.sent), ["alice", "bob"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,265 @@
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Sequence
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (ChannelVersions, Checkpoint,
+                                       CheckpointMetadata,
+                                       get_checkpoint_metadata)
+from langgraph.checkpoint.memory import InMemorySaver
+import asyncio
+import hashlib
+import os
+import pickle
+
+
+DEFAULT_CHECKPOINT_DIR = Path(os.getenv("HITL_CHECKPOINT_DIR", "checkpoints"))
+
+
+# blob type of a list channel stored as the items appended to an earlier
+# version: pickled (earlier version, typed items)
+DELTA = "delta"
+
+
+class AsyncFileSaver(InMemorySaver):
+    """
+    Checkpointer that keeps one append-only log file per thread and serves
+    reads from memory, the logs are replayed when the saver is created.
+
+    Only what changed is stored: the blobs of the channels in new_versions,
+    and for list channels that grew from their previous version (e.g.
+    messages) just the appended items, chained to the previous version.
+    So the cost of a checkpoint follows the size of the step, not the
+    length of the conversation. Chains are cut with a full copy every
+    max_chain versions to keep reads cheap.
+
+    The writes of a superstep are buffered and appended together with the
+    checkpoint that ends it, from a worker thread so the event loop never
+    waits on the disk. Writes not followed by a checkpoint (an interrupt,
+    the end of a run) are flushed after flush_delay seconds.
+
+    Args:
+        path: directory of the log files, defaults to HITL_CHECKPOINT_DIR
+            or ./checkpoints
+        flush_delay: seconds buffered writes wait for their checkpoint
+        max_chain: deltas in a row before a full copy is stored
+    """
+
+    def __init__(self,
+                 path: str | Path | None = None,
+                 flush_delay: float = 0.05,
+                 max_chain: int = 64,
+                 **kwargs):
+        super().__init__(**kwargs)
+        self.path = Path(path) if path else DEFAULT_CHECKPOINT_DIR
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.flush_delay = flush_delay
+        self.max_chain = max_chain
+        self._buffer: dict[str, list[tuple]] = defaultdict(list)
+        self._flush_lock = asyncio.Lock()
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        # (version, value, chain length) of the latest version of every
+        # list channel, what the next version is compared to
+        self._lists: dict[tuple[str, str, str], tuple[Any, list, int]] = {}
+        for file in self.path.glob("*.log"):
+            self._replay(file)
+
+    def _file(self, thread_id: str) -> Path:
+        digest = hashlib.sha256(thread_id.encode()).hexdigest()
+        return self.path / f"{digest}.log"
+
+    def _replay(self, file: Path) -> None:
+        with file.open("r+b") as f:
+            # end of the last complete record
+            good = 0
+            while True:
+                try:
+                    record = pickle.load(f)
+                except Exception:
+                    # the end, or a record torn by a crash: everything
+                    # before it is fine. Cut it off, or the records appended
+                    # after it would never be read back
+                    f.truncate(good)
+                    break
+                good = f.tell()
+                kind, thread_id, checkpoint_ns, checkpoint_id, *rest = record
+                if kind == "writes":
+                    for task_id, idx, channel, value, task_path in rest[0]:
+                        self.writes[(thread_id, checkpoint_ns, checkpoint_id)][
+                            (task_id, idx)] = (task_id, channel, value,
+                                               task_path)
+                    continue
+                checkpoint, metadata, parent, blobs = rest
+                for channel, version, blob in blobs:
+                    self.blobs[(thread_id, checkpoint_ns, channel,
+                                version)] = blob
+                self.storage[thread_id][checkpoint_ns][checkpoint_id] = (
+                    checkpoint, metadata, parent)
+
+    def _load_blobs(self,
+                    thread_id: str,
+                    checkpoint_ns: str,
+                    versions: ChannelVersions) -> dict[str, Any]:
+        channel_values = {}
+        for channel, loaded in versions.items():
+            # walk the deltas back to a full copy
+            suffixes = []
+            version = loaded
+            blob = self.blobs.get((thread_id, checkpoint_ns, channel, version))
+            while blob is not None and blob[0] == DELTA:
+                version, suffix = pickle.loads(blob[1])
+                suffixes.append(suffix)
+                blob = self.blobs.get((thread_id, checkpoint_ns, channel,
+                                       version))
+            if blob is None or blob[0] == "empty":
+                continue
+            value = self.serde.loads_typed(blob)
+            for suffix in reversed(suffixes):
+                value = value + self.serde.loads_typed(suffix)
+            channel_values[channel] = value
+            if isinstance(value, list):
+                # a run resumed from here extends these very objects
+                self._lists[(thread_id, checkpoint_ns, channel)] = (
+                    loaded, value, len(suffixes))
+        return channel_values
+
+    def _store_checkpoint(self,
+                          config: RunnableConfig,
+                          checkpoint: Checkpoint,
+                          metadata: CheckpointMetadata,
+                          new_versions: ChannelVersions) -> RunnableConfig:
+        c = checkpoint.copy()
+        c.pop("pending_sends", None)
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        values: dict[str, Any] = c.pop("channel_values")
+        blobs = []
+        for channel, version in new_versions.items():
+            key = (thread_id, checkpoint_ns, channel)
+            value = values.get(channel)
+            previous = self._lists.pop(key, None)
+            if channel not in values:
+                blob = ("empty", b"")
+            elif (previous is not None and isinstance(value, list)
+                    and previous[2] < self.max_chain
+                    and len(value) >= len(previous[1])
+                    and all(a is b for a, b in zip(previous[1], value))):
+                blob = (DELTA, pickle.dumps((
+                    previous[0],
+                    self.serde.dumps_typed(value[len(previous[1]):]))))
+                self._lists[key] = (version, value, previous[2] + 1)
+            else:
+                blob = self.serde.dumps_typed(value)
+                if isinstance(value, list):
+                    self._lists[key] = (version, value, 0)
+            self.blobs[(thread_id, checkpoint_ns, channel, version)] = blob
+            blobs.append((channel, version, blob))
+
+        entry = (self.serde.dumps_typed(c),
+                 self.serde.dumps_typed(
+                     get_checkpoint_metadata(config, metadata)),
+                 config["configurable"].get("checkpoint_id"))
+        self.storage[thread_id][checkpoint_ns][checkpoint["id"]] = entry
+        self._buffer[thread_id].append(
+            ("checkpoint", thread_id, checkpoint_ns, checkpoint["id"],
+             *entry, blobs))
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def _store_writes(self,
+                      config: RunnableConfig,
+                      writes: Sequence[tuple[str, Any]],
+                      task_id: str,
+                      task_path: str) -> None:
+        super().put_writes(config, writes, task_id, task_path)
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        stored = self.writes[(thread_id, checkpoint_ns, checkpoint_id)]
+        self._buffer[thread_id].append((
+            "writes", thread_id, checkpoint_ns, checkpoint_id,
+            [(t, idx, channel, value, path)
+             for (t, idx), (_, channel, value, path) in stored.items()
+             if t == task_id],
+        ))
+
+    def _write(self, buffered: dict[str, list[tuple]]) -> None:
+        for thread_id, records in buffered.items():
+            with self._file(thread_id).open("ab") as f:
+                f.write(b"".join(pickle.dumps(r) for r in records))
+
+    def flush(self) -> None:
+        """Append the buffered records, blocking"""
+        buffered, self._buffer = self._buffer, defaultdict(list)
+        self._write(buffered)
+
+    async def aflush(self) -> None:
+        """Append the buffered records from a worker thread"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with self._flush_lock:
+            # swapped under the lock, so records are appended in order
+            buffered, self._buffer = self._buffer, defaultdict(list)
+            if buffered:
+                await asyncio.to_thread(self._write, buffered)
+
+    def _flush_soon(self) -> None:
+        task = asyncio.get_running_loop().create_task(self.aflush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def put(self,
+            config: RunnableConfig,
+            checkpoint: Checkpoint,
+            metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        next_config = self._store_checkpoint(config, checkpoint, metadata,
+                                             new_versions)
+        self.flush()
+        return next_config
+
+    def put_writes(self,
+                   config: RunnableConfig,
+                   writes: Sequence[tuple[str, Any]],
+                   task_id: str,
+                   task_path: str = "") -> None:
+        self._store_writes(config, writes, task_id, task_path)
+        self.flush()
+
+    async def aput(self,
+                   config: RunnableConfig,
+                   checkpoint: Checkpoint,
+                   metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        next_config = self._store_checkpoint(config, checkpoint, metadata,
+                                             new_versions)
+        # the superstep is complete, append it with one write
+        self._flush_soon()
+        return next_config
+
+    async def aput_writes(self,
+                          config: RunnableConfig,
+                          writes: Sequence[tuple[str, Any]],
+                          task_id: str,
+                          task_path: str = "") -> None:
+        self._store_writes(config, writes, task_id, task_path)
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.flush_delay, self._flush_soon)
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        self._buffer.pop(thread_id, None)
+        for key in [k for k in self._lists if k[0] == thread_id]:
+            del self._lists[key]
+        self._file(thread_id).unlink(missing_ok=True)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self.aflush()
+        self.delete_thread(thread_id)
@@ -0,0 +1,98 @@
+from typing import Any
+from uuid import UUID
+from hitl_shared.metrics import HitlMetrics
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+import time
+
+
+class MetricsHandler(BaseCallbackHandler):
+    """
+    LangChain callback feeding HitlMetrics from the graph: model calls and
+    their usage_metadata, tool calls, and the supervisor's handoff tools
+    (transfer_to_<agent>, transfer_back_to_<agent>). The agent is the
+    subgraph the call ran in, the supervisor's own calls are
+    "supervisor". Pass it in the "callbacks" of the graph's config.
+    """
+
+    def __init__(self, metrics: HitlMetrics, supervisor: str = "supervisor"):
+        self.metrics = metrics
+        self.supervisor = supervisor
+        # run id -> (agent, tool or None, start)
+        self._runs: dict[UUID, tuple[str, str | None, float]] = {}
+        # (thread, agent) -> when the agent got the conversation
+        self._since: dict[tuple[str, str], float] = {}
+
+    def _agent(self, metadata: dict[str, Any] | None) -> str:
+        namespace = str((metadata or {}).get("langgraph_checkpoint_ns", ""))
+        # "google_agent:<task id>|agent:<task id>" inside an agent
+        if "|" in namespace:
+            return namespace.split(":", 1)[0]
+        return self.supervisor
+
+    def on_chat_model_start(self,
+                            serialized: dict[str, Any],
+                            messages: list[list[Any]],
+                            *,
+                            run_id: UUID,
+                            metadata: dict[str, Any] | None = None,
+                            **kwargs: Any) -> None:
+        agent = self._agent(metadata)
+        now = time.monotonic()
+        self._runs[run_id] = (agent, None, now)
+        thread_id = str((metadata or {}).get("thread_id", ""))
+        self._since.setdefault((thread_id, agent), now)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID,
+                   **kwargs: Any) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        agent, _, start = run
+        seconds = time.monotonic() - start
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                self.metrics.model_call(
+                    agent, seconds, getattr(message, "usage_metadata", None))
+                # one latency per call, not per generation
+                seconds = None
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID,
+                     **kwargs: Any) -> None:
+        self._runs.pop(run_id, None)
+
+    def on_tool_start(self,
+                      serialized: dict[str, Any],
+                      input_str: str,
+                      *,
+                      run_id: UUID,
+                      metadata: dict[str, Any] | None = None,
+                      **kwargs: Any) -> None:
+        tool = (serialized or {}).get("name") or kwargs.get("name", "tool")
+        self._runs[run_id] = (self._agent(metadata), tool, time.monotonic())
+        if tool.startswith("transfer_"):
+            target = tool.removeprefix("transfer_").removeprefix(
+                "back_").removeprefix("to_")
+            source = self._agent(metadata)
+            thread_id = str((metadata or {}).get("thread_id", ""))
+            since = self._since.pop((thread_id, source), None)
+            self.metrics.handoff(
+                source, target,
+                None if since is None else time.monotonic() - since)
+            self._since[(thread_id, target)] = time.monotonic()
+
+    def on_tool_end(self, output: Any, *, run_id: UUID,
+                    **kwargs: Any) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is not None and not run[1].startswith("transfer_"):
+            self.metrics.tool_call(run[0], run[1],
+                                   time.monotonic() - run[2])
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID,
+                      **kwargs: Any) -> None:
+        run = self._runs.pop(run_id, None)
+        # an interrupt waiting for a human is not a failure
+        if run is not None and type(error).__name__ != "GraphInterrupt":
+            self.metrics.tool_call(run[0], run[1],
+                                   time.monotonic() - run[2], failed=True)
@@ -0,0 +1,51 @@
+from typing import Any
+from uuid import UUID
+from hitl_shared.prompt_cache import PromptCacheStats, get_field
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+
+class PromptCacheHandler(BaseCallbackHandler):
+    """
+    LangChain callback recording the cache usage of every chat model call
+    in PromptCacheStats, per thread, and warning when an agent's system
+    prompt or tool schemas change between calls. Pass it in the
+    "callbacks" of the graph's config.
+    """
+
+    def __init__(self, stats: PromptCacheStats):
+        self.stats = stats
+        self._threads: dict[UUID, str] = {}
+
+    def on_chat_model_start(self,
+                            serialized: dict[str, Any],
+                            messages: list[list[Any]],
+                            *,
+                            run_id: UUID,
+                            metadata: dict[str, Any] | None = None,
+                            **kwargs: Any) -> None:
+        self._threads[run_id] = str((metadata or {}).get("thread_id", ""))
+        tools = (kwargs.get("invocation_params") or {}).get("tools") or []
+        names = sorted(
+            get_field(get_field(tool, "function") or {}, "name") or ""
+            for tool in tools)
+        label = ",".join(names) or "no tools"
+        system = [message.content for message in messages[0]
+                  if message.type == "system"]
+        if not self.stats.check_prefix(label, system, tools):
+            print(f"### prompt prefix of the agent with tools {label}"
+                  " changed, its prompt cache starts over")
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID,
+                   **kwargs: Any) -> None:
+        thread_id = self._threads.pop(run_id, "")
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                if usage:
+                    self.stats.record(usage, thread_id)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID,
+                     **kwargs: Any) -> None:
+        self._threads.pop(run_id, None)
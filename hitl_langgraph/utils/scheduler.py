@@ -0,0 +1,261 @@
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable
+from urllib.parse import parse_qs, unquote, urlsplit
+import asyncio
+import json
+
+
+class ThreadScheduler:
+    """
+    Runs the turns of many conversation threads on a bounded pool of
+    workers sharing one event loop.
+
+    - Each thread has its own queue and at most one turn running, so the
+      turns of a thread run in the order they were submitted.
+    - Threads with work wait in a single round-robin queue and a worker
+      runs one turn before sending the thread to the back, so a busy
+      thread can't starve the others.
+    - A thread waiting on a human (an interrupt) is parked: it holds no
+      worker and its queued turns stay queued until resume() is called,
+      the resume input runs before them.
+    - A thread belongs to the first user bound to it, see bind().
+
+    Args:
+        run: coroutine run(thread_id, input) running one turn, its result
+            is what submit() and resume() resolve to
+        workers: turns running at the same time
+        max_queued: turns a thread can have queued, submit raises
+            asyncio.QueueFull beyond that
+        max_results: threads whose last result is kept, the least
+            recently updated are forgotten first
+    """
+
+    def __init__(self,
+                 run: Callable[[str, Any], Awaitable[Any]],
+                 workers: int = 8,
+                 max_queued: int = 32,
+                 max_results: int = 1024):
+        self.run = run
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_results = max_results
+        self.results: OrderedDict[str, Any] = OrderedDict()
+        self.owners: dict[str, str] = {}
+        self._queues: dict[str, deque[tuple[Any, asyncio.Future]]] = {}
+        self._ready: asyncio.Queue[str] = asyncio.Queue()
+        # threads in _ready or running a turn
+        self._scheduled: set[str] = set()
+        self._parked: set[str] = set()
+        self._workers: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._workers = [asyncio.create_task(self._work())
+                         for _ in range(self.workers)]
+
+    async def close(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        for queue in self._queues.values():
+            for _, future in queue:
+                future.cancel()
+        self._queues.clear()
+
+    def _schedule(self, thread_id: str) -> None:
+        if (thread_id in self._scheduled or thread_id in self._parked
+                or not self._queues.get(thread_id)):
+            return
+        self._scheduled.add(thread_id)
+        self._ready.put_nowait(thread_id)
+
+    def bind(self, thread_id: str, user_id: str) -> None:
+        """
+        Give the thread to the user on first use
+
+        Raises:
+            PermissionError: the thread belongs to another user
+        """
+        owner = self.owners.setdefault(thread_id, user_id)
+        if owner != user_id:
+            raise PermissionError(f"thread {thread_id} belongs to"
+                                  " another user")
+
+    def submit(self, thread_id: str, input: Any) -> asyncio.Future:
+        """Queue a turn of the thread"""
+        queue = self._queues.setdefault(thread_id, deque())
+        if len(queue) >= self.max_queued:
+            raise asyncio.QueueFull(f"thread {thread_id} has"
+                                    f" {len(queue)} turns queued")
+        future = asyncio.get_running_loop().create_future()
+        queue.append((input, future))
+        self._schedule(thread_id)
+        return future
+
+    def park(self, thread_id: str) -> None:
+        """Run nothing more for the thread until it is resumed"""
+        self._parked.add(thread_id)
+
+    def resume(self, thread_id: str, input: Any) -> asyncio.Future:
+        """Unpark the thread, input runs before its queued turns"""
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(thread_id, deque()).appendleft(
+            (input, future))
+        self._parked.discard(thread_id)
+        self._schedule(thread_id)
+        return future
+
+    def fail(self, thread_id: str, error: Exception) -> None:
+        """Unpark a thread whose resume input couldn't be made, the error
+        becomes its last result"""
+        self._record(thread_id, {"error": str(error)})
+        self._parked.discard(thread_id)
+        self._schedule(thread_id)
+
+    def _record(self, thread_id: str, result: Any) -> None:
+        self.results[thread_id] = result
+        self.results.move_to_end(thread_id)
+        while len(self.results) > self.max_results:
+            self.results.popitem(last=False)
+
+    def status(self, thread_id: str) -> dict[str, Any]:
+        if thread_id in self._parked:
+            state = "parked"
+        elif thread_id in self._scheduled:
+            state = "running"
+        else:
+            state = "idle"
+        return {
+            "thread_id": thread_id,
+            "state": state,
+            "queued": len(self._queues.get(thread_id, ())),
+            "last_result": self.results.get(thread_id),
+        }
+
+    def threads(self) -> list[str]:
+        return sorted(set(self._queues) | self._parked | self._scheduled
+                      | set(self.results))
+
+    async def _work(self) -> None:
+        while True:
+            thread_id = await self._ready.get()
+            queue = self._queues[thread_id]
+            input, future = queue.popleft()
+            try:
+                result = await self.run(thread_id, input)
+                self._record(thread_id, result)
+                if not future.done():
+                    future.set_result(result)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self._scheduled.discard(thread_id)
+                if not queue and thread_id not in self._parked:
+                    del self._queues[thread_id]
+                # back of the line, behind every other thread with work
+                self._schedule(thread_id)
+
+
+class HttpThreadBackend:
+    """
+    Local HTTP API to talk to the threads of a ThreadScheduler:
+
+        GET  /threads                    status of every known thread
+        GET  /threads/<id>               status and last result of a thread
+        POST /threads/<id>/messages      body: the user message, answers
+                                         with the result of the turn
+        POST /threads/<id>/messages?user=<id>
+
+    The scheduler receives {"user_id": ..., "content": ...} as input. A
+    thread only takes messages from the user of its first message,
+    messages without a user come from default_user_id.
+    """
+
+    def __init__(self,
+                 scheduler: ThreadScheduler,
+                 host: str = "127.0.0.1",
+                 port: int = 8766,
+                 default_user_id: str | None = None):
+        self.scheduler = scheduler
+        self.host = host
+        self.port = port
+        self.default_user_id = default_user_id
+        self._server: asyncio.Server | None = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle,
+                                                  self.host, self.port)
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _respond(self, writer: asyncio.StreamWriter,
+                       status: str, payload: Any) -> None:
+        body = json.dumps(payload, default=str).encode()
+        writer.write(f"HTTP/1.1 {status}\r\n"
+                     "Content-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     "Connection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+        writer.close()
+
+    async def _handle(self, reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter) -> None:
+        try:
+            method, path, _ = (await reader.readline()).decode().split(" ", 2)
+            length = 0
+            while (line := await reader.readline()) not in (b"\r\n", b"\n",
+                                                            b""):
+                name, _, value = line.decode().partition(":")
+                if name.strip().lower() == "content-length":
+                    length = int(value)
+            body = (await reader.readexactly(length)).decode()
+        except (ValueError, asyncio.IncompleteReadError):
+            await self._respond(writer, "400 Bad Request",
+                                {"error": "bad request"})
+            return
+
+        url = urlsplit(path)
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+        if method == "GET" and parts == ["threads"]:
+            await self._respond(writer, "200 OK",
+                                [self.scheduler.status(thread_id)
+                                 for thread_id in self.scheduler.threads()])
+        elif method == "GET" and len(parts) == 2 and parts[0] == "threads":
+            await self._respond(writer, "200 OK",
+                                self.scheduler.status(parts[1]))
+        elif (method == "POST" and len(parts) == 3
+              and parts[0] == "threads" and parts[2] == "messages"):
+            if not body.strip():
+                await self._respond(writer, "400 Bad Request",
+                                    {"error": "empty message"})
+                return
+            user_id = parse_qs(url.query).get("user",
+                                              [self.default_user_id])[0]
+            try:
+                if user_id is not None:
+                    self.scheduler.bind(parts[1], user_id)
+                future = self.scheduler.submit(
+                    parts[1], {"user_id": user_id, "content": body})
+            except PermissionError as e:
+                await self._respond(writer, "403 Forbidden",
+                                    {"error": str(e)})
+                return
+            except asyncio.QueueFull as e:
+                await self._respond(writer, "429 Too Many Requests",
+                                    {"error": str(e)})
+                return
+            try:
+                result = await future
+            except Exception as e:
+                await self._respond(writer, "500 Internal Server Error",
+                                    {"error": str(e)})
+                return
+            await self._respond(writer, "200 OK", result)
+        else:
+            await self._respond(writer, "404 Not Found", {"error": "not found"})
@@ -0,0 +1,36 @@
+from hitl_shared.result_cache import ResultCache
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool, StructuredTool
+
+
+def add_result_cache(target_tool: BaseTool, cache: ResultCache) -> BaseTool:
+    """Wrap a tool so read-only results are served from the cache, the
+    wrapper can be invoked sync or async like the tool it wraps."""
+
+    def call_tool_with_cache(config: RunnableConfig, **tool_input):
+        user_id = config["configurable"].get("user_id")
+        cached = cache.get(user_id, target_tool.name, tool_input)
+        if cached is not ResultCache.MISS:
+            return cached
+
+        tool_response = target_tool.invoke(tool_input, config)
+        cache.record(user_id, target_tool.name, tool_input, tool_response)
+        return tool_response
+
+    async def acall_tool_with_cache(config: RunnableConfig, **tool_input):
+        user_id = config["configurable"].get("user_id")
+        cached = cache.get(user_id, target_tool.name, tool_input)
+        if cached is not ResultCache.MISS:
+            return cached
+
+        tool_response = await target_tool.ainvoke(tool_input, config)
+        cache.record(user_id, target_tool.name, tool_input, tool_response)
+        return tool_response
+
+    return StructuredTool.from_function(
+        func=call_tool_with_cache,
+        coroutine=acall_tool_with_cache,
+        name=target_tool.name,
+        description=target_tool.description,
+        args_schema=target_tool.args_schema,
+    )
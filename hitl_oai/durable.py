@@ -0,0 +1,39 @@
+from agents import TResponseInputItem
+from hitl_shared.durable import DurableStore
+import json
+
+
+class DurableHistory:
+    """
+    Conversation history of one session kept in a DurableStore.
+
+    The history only grows between turns (result.to_input_list() extends
+    the input), so save() appends the items that are new since the last
+    save instead of rewriting the conversation. A history that shrank or
+    was replaced is written again from scratch.
+
+    Args:
+        store: where the history is kept
+        session_id: the conversation
+    """
+
+    def __init__(self, store: DurableStore, session_id: str):
+        self.store = store
+        self.session_id = session_id
+        self._saved: list[TResponseInputItem] = []
+
+    def load(self) -> list[TResponseInputItem]:
+        """The stored history, empty for a new session"""
+        self._saved = [json.loads(value) for _, value
+                       in self.store.log("oai_history", self.session_id)]
+        return list(self._saved)
+
+    def save(self, history: list[TResponseInputItem]) -> None:
+        saved = len(self._saved)
+        if history[:saved] != self._saved:
+            self.store.clear("oai_history", self.session_id)
+            saved = 0
+        for item in history[saved:]:
+            self.store.append("oai_history", self.session_id,
+                              json.dumps(item, default=str))
+        self._saved = list(history)
@@ -4,12 +4,28 @@ from functools import partial
 from arcadepy import AsyncArcade
 from agents_arcade import get_arcade_tools
 from typing import Any
-from jit_permissions.tools import (UserDeniedToolCall,
-                                   confirm_tool_usage,
-                                   auth_tool)
+from hitl_shared.metrics import HitlMetrics, HttpMetricsBackend
+from hitl_shared.tracing import JsonlExporter, OtlpJsonExporter, Tracer
+from jit_permissions.tools import confirm_tool_usage
+from hitl_shared.auth import auth_tools
+from hitl_shared.approvals import HttpApprovalBackend, get_approval_broker
+from hitl_shared.policy import (APPROVE, DEFAULT_RULES, ApprovalPolicy,
+                                Limit, Rule, recipient_domain_in)
+from hitl_shared.result_cache import ResultCache
+from tool_cache import cached_tool_call
+from tool_timing import timed_tool_call
+from durable import DurableHistory, DurableStore
+from history import HistoryCompactor
+from openai import AsyncOpenAI
+from hitl_shared.prompt_cache import PromptCacheStats
+from prompt_cache import StablePrefixModel
+from streaming import ConsoleStream, SseStream, TurnStreamer
 
+import asyncio
 import dotenv
 import os
+import sys
+import time
 import agentops
 dotenv.load_dotenv()
 
@@ -17,67 +33,131 @@ AGENTOPS_API_KEY = os.getenv("AGENTOPS_API_KEY")
 
 agentops.init(tags="arcade")
 
-ENFORCE_HUMAN_CONFIRMATION = [
-    "Google_SendEmail",
-    "Slack_SendDmToUser",
-]
-
 
 class CustomAgentHooks(AgentHooks):
-    def __init__(self, display_name: str):
-        self.event_counter = 0
+    """
+    Times the agent and its handoffs in metrics and as spans of the
+    tracer: a span per agent under the turn's span (opened by the caller
+    with the key ("turn", id(context))) and a span per tool call under the
+    agent's. Tool latency is measured by timed_tool_call instead, these
+    hooks run while a call waits on its approval. Spans and timings are
+    keyed by the run: id() of the context object passed to the Runner,
+    context.context in the hooks.
+
+    The SDK calls neither on_tool_end nor on_end when a tool raises, the
+    caller ends what the failed run left open with abort().
+    """
+
+    # (run, agent) -> start and the run's input/output tokens at the start,
+    # shared by the hooks of all agents since a handoff is reported to the
+    # target's hooks
+    _running: dict[tuple[int, str], tuple[float, int, int]] = {}
+
+    def __init__(self,
+                 display_name: str,
+                 metrics: HitlMetrics | None = None,
+                 tracer: Tracer | None = None):
         self.display_name = display_name
+        self.metrics = metrics
+        self.tracer = tracer
+        # (run, tool) -> span keys of the calls in flight
+        self._tools: dict[tuple[int, str], list[tuple]] = {}
+        self._tool_calls = 0
+
+    def _agent_done(self, context: RunContextWrapper, agent: Agent,
+                    **attributes: Any) -> float:
+        """Record the agent's run so far, returns its duration"""
+        if self.tracer is not None:
+            self.tracer.end(("agent", id(context.context), agent.name),
+                            **attributes)
+        started = self._running.pop((id(context.context), agent.name),
+                                    None)
+        if started is None or self.metrics is None:
+            return 0.0
+        seconds = time.monotonic() - started[0]
+        self.metrics.agent_run(agent.name, seconds, {
+            "input_tokens": context.usage.input_tokens - started[1],
+            "output_tokens": context.usage.output_tokens - started[2],
+        })
+        return seconds
 
     async def on_start(self,
                        context: RunContextWrapper,
                        agent: Agent) -> None:
-        self.event_counter += 1
-        print(f"### ({self.display_name}) {
-              self.event_counter}: Agent {agent.name} started")
+        self._running[(id(context.context), agent.name)] = (
+            time.monotonic(), context.usage.input_tokens,
+            context.usage.output_tokens)
+        if self.tracer is not None:
+            self.tracer.start(("agent", id(context.context), agent.name),
+                              f"agent {agent.name}",
+                              parent=("turn", id(context.context)),
+                              agent=agent.name, hooks=self.display_name)
 
     async def on_end(self,
                      context: RunContextWrapper,
                      agent: Agent,
                      output: Any) -> None:
-        self.event_counter += 1
-        print(
-            f"### ({self.display_name}) {self.event_counter}: Agent {
-                # agent.name} ended with output {output}"
-                agent.name} ended"
-        )
+        self._agent_done(context, agent,
+                         input_tokens=context.usage.input_tokens,
+                         output_tokens=context.usage.output_tokens)
 
     async def on_handoff(self,
                          context: RunContextWrapper,
                          agent: Agent,
                          source: Agent) -> None:
-        self.event_counter += 1
-        print(
-            f"### ({self.display_name}) {self.event_counter}: Agent {
-                source.name} handed off to {agent.name}"
-        )
+        seconds = self._agent_done(context, source, handoff_to=agent.name)
+        if self.metrics is not None:
+            self.metrics.handoff(source.name, agent.name, seconds)
+        if self.tracer is not None:
+            self.tracer.event(("turn", id(context.context)), "handoff",
+                              source=source.name, target=agent.name)
 
     async def on_tool_start(self,
                             context: RunContextWrapper,
                             agent: Agent,
                             tool: Tool) -> None:
-        self.event_counter += 1
-        print(
-            f"### ({self.display_name}) {self.event_counter}:"
-            f" Agent {agent.name} started tool {tool.name}"
-            f" with context: {context.context}"
-        )
+        self._tool_calls += 1
+        key = ("tool", id(context.context), agent.name, self._tool_calls)
+        self._tools.setdefault((id(context.context), tool.name),
+                               []).append(key)
+        if self.tracer is not None:
+            self.tracer.start(key, f"tool {tool.name}",
+                              parent=("agent", id(context.context),
+                                      agent.name),
+                              agent=agent.name, tool=tool.name)
 
     async def on_tool_end(self,
                           context: RunContextWrapper,
                           agent: Agent,
                           tool: Tool,
                           result: str) -> None:
-        self.event_counter += 1
-        print(
-            f"### ({self.display_name}) {self.event_counter}: Agent {
-                # agent.name} ended tool {tool.name} with result {result}"
-                agent.name} ended tool {tool.name}"
-        )
+        starts = self._tools.get((id(context.context), tool.name))
+        if not starts:
+            return
+        key = starts.pop()
+        if not starts:
+            del self._tools[(id(context.context), tool.name)]
+        if self.tracer is not None:
+            self.tracer.end(key, result_chars=len(str(result)))
+
+    def abort(self, run: int, error: str) -> None:
+        """
+        End the tool and agent spans a failed run left open and forget
+        their timings
+
+        Args:
+            run: id of the run's context object
+            error: recorded on the spans
+        """
+        for call in [call for call in self._tools if call[0] == run]:
+            for key in self._tools.pop(call):
+                if self.tracer is not None:
+                    self.tracer.end(key, error=error)
+        for running in [running for running in self._running
+                        if running[0] == run]:
+            del self._running[running]
+            if self.tracer is not None:
+                self.tracer.end(("agent", *running), error=error)
 
 
 async def main():
@@ -93,25 +173,73 @@ async def main():
     slack_tools = await get_arcade_tools(
         client, tools=["Slack_ListUsers", "Slack_SendDmToUser"])
 
-    for tool in google_tools + slack_tools:
-        # - human in the loop
-        if tool.name in ENFORCE_HUMAN_CONFIRMATION:
+    # internal email (up to 20 a day) doesn't need a human
+    policy = ApprovalPolicy(
+        rules=[Rule("Google_SendEmail", APPROVE,
+                    when=recipient_domain_in("arcade.dev"),
+                    name="internal email"),
+               *DEFAULT_RULES],
+        limits=[Limit("Google_SendEmail", max_calls=20, period=24 * 60 * 60)],
+    )
+
+    # latency and tokens per agent, tool and handoff, for Prometheus at
+    # http://127.0.0.1:9464/metrics
+    metrics = HitlMetrics()
+
+    result_cache = ResultCache()
+    for agent_name, tools in (("Google Agent", google_tools),
+                              ("Slack agent", slack_tools)):
+        for tool in tools:
+            # - latency of the call itself, the approval wait isn't part of it
+            tool.on_invoke_tool = partial(
+                timed_tool_call,
+                agent_name=agent_name,
+                tool_name=tool.name,
+                callback=tool.on_invoke_tool,
+                metrics=metrics,
+            )
+            # - human in the loop, unless the policy approves every call
+            if not policy.always_approves(tool.name):
+                tool.on_invoke_tool = partial(
+                    confirm_tool_usage,
+                    tool_name=tool.name,
+                    callback=tool.on_invoke_tool,
+                    policy=policy,
+                )
+            # - read-only results are reused until a write tool runs
             tool.on_invoke_tool = partial(
-                confirm_tool_usage,
+                cached_tool_call,
                 tool_name=tool.name,
                 callback=tool.on_invoke_tool,
+                cache=result_cache,
             )
-        # - auth
-        await auth_tool(client, tool.name, user_id=context["user_id"])
+
+    # - auth, one link per provider instead of one round-trip per tool
+    await auth_tools(client,
+                     [tool.name for tool in google_tools + slack_tools],
+                     user_id=context["user_id"])
+
+    # every request is assembled the same way (sorted tools, canonical
+    # schemas) so the agents hit the prompt cache, hits are counted
+    cache_stats = PromptCacheStats()
+    # a span per turn, agent and tool call, written off the request path
+    # to hitl_spans.jsonl and, as OTLP/JSON, to hitl_spans.otlp.jsonl
+    tracer = Tracer(
+        [JsonlExporter("hitl_spans.jsonl"),
+         OtlpJsonExporter("hitl_spans.otlp.jsonl", service_name="hitl-oai")],
+        sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "1.0")))
+    model = StablePrefixModel(os.environ["OPENAI_MODEL"], AsyncOpenAI(),
+                              cache_stats)
 
     google_agent = Agent(
         name="Google Agent",
         instructions="You are a helpful assistant that can assist using tools"
                      " to manage a Google account, contacts, and inbox.",
         handoff_description="An agent equipped with Google tools",
-        model=os.environ["OPENAI_MODEL"],
+        model=model,
         tools=google_tools,
-        hooks=CustomAgentHooks(display_name="Google Agent")
+        hooks=CustomAgentHooks(display_name="Google Agent", metrics=metrics,
+                               tracer=tracer)
     )
 
     slack_agent = Agent(
@@ -120,9 +248,10 @@ async def main():
                      " to interact with Slack."
                      " You have tools to manage channels and send DMs.",
         handoff_description="An agent equipped with Slack tools",
-        model=os.environ["OPENAI_MODEL"],
+        model=model,
         tools=slack_tools,
-        hooks=CustomAgentHooks(display_name="Slack Agent"),
+        hooks=CustomAgentHooks(display_name="Slack Agent", metrics=metrics,
+                               tracer=tracer),
     )
 
     conversation_agent = Agent(
@@ -132,44 +261,89 @@ async def main():
                      " Gmail tools if needed. You can also handoff to an agent"
                      " with Slack tools if needed. Handoff to the appropriate"
                      " agent based on the services required.",
-        model=os.environ["OPENAI_MODEL"],
+        model=model,
         handoffs=[google_agent, slack_agent],
-        hooks=CustomAgentHooks(display_name="Conversation Agent")
+        hooks=CustomAgentHooks(display_name="Conversation Agent",
+                               metrics=metrics, tracer=tracer)
     )
 
     google_agent.handoffs.extend([conversation_agent, slack_agent])
     slack_agent.handoffs.extend([conversation_agent, google_agent])
 
-    # initialize the conversation
-    history: list[TResponseInputItem] = []
+    # history and pending approvals survive restarts
+    store = DurableStore()
+    get_approval_broker().persist_to(store)
+    durable_history = DurableHistory(store, context["user_id"])
+
+    # reviewers can answer approvals over HTTP as well as on the console
+    approvals_http = HttpApprovalBackend(get_approval_broker())
+    await approvals_http.start()
+    metrics_http = HttpMetricsBackend(metrics.registry)
+    await metrics_http.start()
+
+    # --stream shows text, handoffs and approvals as they happen, on the
+    # console and at http://127.0.0.1:8767/events
+    streamer = None
+    if "--stream" in sys.argv:
+        events_http = SseStream()
+        await events_http.start()
+        streamer = TurnStreamer([ConsoleStream(), events_http],
+                                broker=get_approval_broker())
+
+    # initialize the conversation, or pick it up where it was left
+    history: list[TResponseInputItem] = durable_history.load()
+    # - old turns and large tool outputs are compacted, so what is sent
+    #   with every run stays within a token budget
+    compactor = HistoryCompactor(
+        budget=int(os.getenv("HISTORY_TOKEN_BUDGET", "16000")))
     # run the loop!
-    while True:
-        prompt = input("You: ")
-        if prompt.lower() == "exit":
-            break
-        history.append({"role": "user", "content": prompt})
-        try:
-            result = await Runner.run(
-                starting_agent=conversation_agent,
-                input=history,
-                context=context
-            )
+    try:
+        while True:
+            prompt = await asyncio.to_thread(input, "You: ")
+            if prompt.lower() == "exit":
+                # nothing is left waiting on approvals of the ended session
+                get_approval_broker().close_session(
+                    context.get("session_id", context["user_id"]))
+                break
+            history.append({"role": "user", "content": prompt})
+            history = compactor.compact(history)
+            turn = ("turn", id(context))
+            tracer.start(turn, "turn", user_id=context["user_id"],
+                         history_items=len(history))
+            # denied calls come back as tool outputs, the agent answers them
+            try:
+                if streamer is not None:
+                    result = await streamer.run(conversation_agent, history,
+                                                context)
+                else:
+                    result = await Runner.run(
+                        starting_agent=conversation_agent,
+                        input=history,
+                        context=context
+                    )
+                    print(result.final_output)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                for agent in (conversation_agent, google_agent, slack_agent):
+                    agent.hooks.abort(id(context), error)
+                tracer.end(turn, error=error)
+                print(f"### the turn failed, try again: {error}")
+                # the prompt isn't answered, it stays out of the history
+                history = history[:-1]
+                continue
             history = result.to_input_list()
-            print(result.final_output)
-        except UserDeniedToolCall as e:
-            history.extend([
-                {"role": "assistant",
-                 "content": f"Please confirm the call to {e.tool_name}"},
-                {"role": "user",
-                 "content": "I changed my mind, please don't do it!"},
-                {"role": "assistant",
-                 "content": f"Sure, I cancelled the call to {e.tool_name}."
-                 " What else can I do for you today?"
-                 },
-            ])
-            print(history[-1]["content"])
+            tracer.end(turn)
+            # only the items new in this turn are written
+            durable_history.save(history)
+            print(f"### prompt cache: {cache_stats.end_turn()}")
+    finally:
+        await approvals_http.close()
+        await metrics_http.close()
+        if streamer is not None:
+            await events_http.close()
+        tracer.close()
+        store.close()
 
-if __name__ == "__main__":
-    import asyncio
 
+if __name__ == "__main__":
     asyncio.run(main())
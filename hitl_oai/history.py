@@ -0,0 +1,159 @@
+import json
+from typing import Any
+from agents import TResponseInputItem
+
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:"
+
+
+def estimate_tokens(item: Any) -> int:
+    """Rough token count of an input item, about 4 characters a token"""
+    if isinstance(item, str):
+        return len(item) // 4 + 1
+    return len(json.dumps(item, separators=(",", ":"), default=str)) // 4 + 1
+
+
+def _text(item: TResponseInputItem) -> str:
+    """The text of a message item, whatever its content shape"""
+    content = item.get("content", "")
+    if isinstance(content, str):
+        return content
+    return " ".join(part.get("text", "") for part in content
+                    if isinstance(part, dict))
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+class HistoryCompactor:
+    """
+    Keeps the conversation history sent with every run within a token
+    budget, without calling the model.
+
+    - Tool outputs larger than max_tool_output_tokens in turns older than
+      keep_turns are replaced by a short reference: the tool, the size
+      and the start of the output.
+    - Once the history is over budget, the oldest turns are replaced by a
+      one-line extract each (what the user asked, the tools used, how the
+      assistant answered) in a summary message at the start, until the
+      history fits in target_ratio of the budget. The gap between the two
+      keeps the summary, and the prefix sent to the model, unchanged for
+      a while instead of shifting every turn.
+
+    A turn starts at a user message, turns are dropped whole so a
+    function call is never separated from its output.
+
+    Args:
+        budget: tokens the history may use, as estimated by estimate_tokens
+        keep_turns: most recent turns that are never compacted
+        max_tool_output_tokens: larger outputs of older turns are collapsed
+        target_ratio: share of the budget to compact down to
+        max_summary_tokens: oldest summary lines are dropped beyond that
+    """
+
+    def __init__(self,
+                 budget: int = 16_000,
+                 keep_turns: int = 2,
+                 max_tool_output_tokens: int = 500,
+                 target_ratio: float = 0.75,
+                 max_summary_tokens: int = 1_000):
+        self.budget = budget
+        self.keep_turns = keep_turns
+        self.max_tool_output_tokens = max_tool_output_tokens
+        self.target_ratio = target_ratio
+        self.max_summary_tokens = max_summary_tokens
+
+    @staticmethod
+    def _is_summary(item: TResponseInputItem) -> bool:
+        return (item.get("role") == "system"
+                and _text(item).startswith(SUMMARY_PREFIX))
+
+    @staticmethod
+    def _turns(items: list[TResponseInputItem]
+               ) -> list[list[TResponseInputItem]]:
+        turns: list[list[TResponseInputItem]] = []
+        for item in items:
+            if item.get("role") == "user" or not turns:
+                turns.append([])
+            turns[-1].append(item)
+        return turns
+
+    def _collapse(self, turn: list[TResponseInputItem]
+                  ) -> list[TResponseInputItem]:
+        names = {item["call_id"]: item.get("name", "a tool")
+                 for item in turn if item.get("type") == "function_call"}
+        collapsed = []
+        for item in turn:
+            output = item.get("output")
+            if (item.get("type") == "function_call_output"
+                    and isinstance(output, str)
+                    and estimate_tokens(output) > self.max_tool_output_tokens):
+                name = names.get(item["call_id"], "the tool")
+                item = {**item, "output": (
+                    f"[{name} returned {len(output):,} characters, left out"
+                    " to save context, call it again if the details are"
+                    f" needed. It started with: {_shorten(output, 200)}]")}
+            collapsed.append(item)
+        return collapsed
+
+    @staticmethod
+    def _summarize(turn: list[TResponseInputItem]) -> str:
+        asked = ""
+        tools = []
+        answered = ""
+        for item in turn:
+            if item.get("role") == "user" and not asked:
+                asked = _text(item)
+            elif item.get("type") == "function_call":
+                tools.append(item.get("name", "a tool"))
+            elif item.get("role") == "assistant":
+                answered = _text(item)
+        line = f"- the user asked: {_shorten(asked, 120)}"
+        if tools:
+            line += f"; tools used: {', '.join(dict.fromkeys(tools))}"
+        if answered:
+            line += f"; the assistant answered: {_shorten(answered, 120)}"
+        return line
+
+    def compact(self, history: list[TResponseInputItem]
+                ) -> list[TResponseInputItem]:
+        """
+        The history to send with the next run, the input is not modified
+
+        Returns:
+            list[TResponseInputItem]: history within the budget, except
+                when the kept turns alone are larger
+        """
+        summary_lines: list[str] = []
+        items = history
+        if items and self._is_summary(items[0]):
+            summary_lines = _text(items[0]).splitlines()[1:]
+            items = items[1:]
+
+        turns = self._turns(items)
+        old = max(0, len(turns) - self.keep_turns)
+        turns = [self._collapse(turn) if i < old else turn
+                 for i, turn in enumerate(turns)]
+
+        sizes = [sum(estimate_tokens(item) for item in turn)
+                 for turn in turns]
+        total = sum(sizes) + estimate_tokens("\n".join(summary_lines))
+        if total > self.budget:
+            target = self.budget * self.target_ratio
+            while old and total > target:
+                summary_lines.append(self._summarize(turns.pop(0)))
+                total -= sizes.pop(0)
+                old -= 1
+            while (len(summary_lines) > 1 and estimate_tokens(
+                    "\n".join(summary_lines)) > self.max_summary_tokens):
+                summary_lines.pop(0)
+
+        compacted = [item for turn in turns for item in turn]
+        if summary_lines:
+            compacted.insert(0, {
+                "role": "system",
+                "content": "\n".join([SUMMARY_PREFIX, *summary_lines]),
+            })
+        return compacted
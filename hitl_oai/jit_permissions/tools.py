@@ -1,43 +1,76 @@
 from arcadepy import AsyncArcade
-from agents import AgentsException, RunContextWrapper
-from pprint import pp
+from agents import RunContextWrapper
+from hitl_shared.approvals import get_approval_broker
+from hitl_shared.policy import APPROVE, DENY, ApprovalPolicy
+from hitl_shared.prompt_cache import canonical_json
+from typing import Any
+import hashlib
 import json
 
 
-class UserDeniedToolCall(AgentsException):
-    """Exception raised when an user denies a tool call"""
+# sends email and Slack DMs to a human, approves everything else
+APPROVAL_POLICY = ApprovalPolicy()
 
-    message: str
 
-    def __init__(self, message: str):
-        self.message = message
+def stable_call_id(tool_name: str, args: Any) -> str:
+    """
+    Id of a tool call derived from its name and canonical arguments, the
+    function tool callback doesn't get the model's call id
+    """
+    digest = hashlib.sha256(
+        f"{tool_name}:{canonical_json(args)}".encode()).hexdigest()
+    return f"{tool_name}:{digest[:16]}"
 
 
 async def confirm_tool_usage(context: RunContextWrapper,
                              tool_args: str,
                              tool_name: str,
-                             callback) -> str:
+                             callback,
+                             policy: ApprovalPolicy = APPROVAL_POLICY) -> str:
     """
-    Ask the user to confirm the use of a specific tool
+    Ask the user to confirm the use of a specific tool, unless the policy
+    decides the call on its own
+
+    The approval is keyed by stable_call_id, so repeating the same call
+    while it is pending, or after a restart, joins the request already
+    waiting instead of asking twice. A denial is the output of the call,
+    not an exception, so calls approved in the same step still run and
+    stay in the history.
 
     Args:
         context: OpenAI Agents SDK run context
         tool_args: parameters for the function, JSON as a string.
         tool_name: the name of the tool that we want to call
         callable: the function that we should call if approved
+        policy: decides which calls need a human
 
     Returns:
-        str: The output of the tool call
+        str: The output of the tool call, or why it didn't run
     """
-    print("\nThe agent requires permission:\n"
-          f"I'm about to call {tool_name} with these arguments:")
-    pp(json.loads(tool_args))
-    clarification = input("Your response [y/n]: ")
-    while clarification.lower() not in ["y", "n"]:
-        clarification = input("Your response (must be either y or n): ")
-    if clarification.lower() == "y":
+    user_id = context.context["user_id"]
+    args = json.loads(tool_args)
+    decision = policy.decide(user_id, tool_name, args)
+    if decision.action == APPROVE:
         return await callback(context, tool_args)
-    raise UserDeniedToolCall(tool_name)
+    if decision.action == DENY:
+        return f"The call to {tool_name} is not allowed: {decision.reason}"
+    # wait on the broker instead of input() so other sessions keep running
+    session_id = context.context.get("session_id", user_id)
+    request = get_approval_broker().submit(tool_name, args,
+                                           session_id=session_id,
+                                           call_id=stable_call_id(tool_name,
+                                                                  args),
+                                           deadline=decision.deadline,
+                                           on_timeout=decision.on_timeout)
+    if await request.future:
+        if request.grant_minutes:
+            policy.grant(user_id, tool_name, args, request.grant_minutes)
+        return await callback(context, tool_args)
+    if request.timed_out:
+        return (f"Nobody approved the call to {tool_name} in time,"
+                " it was denied")
+    return (f"The user denied permission to call {tool_name}"
+            " with these arguments")
 
 
 async def auth_tool(client: AsyncArcade, tool_name: str, user_id: str):
@@ -45,3 +78,4 @@ async def auth_tool(client: AsyncArcade, tool_name: str, user_id: str):
     if result.status != "completed":
         print(f"Click this link to authorize {tool_name}:\n{result.url}")
     await client.auth.wait_for_completion(result)
+
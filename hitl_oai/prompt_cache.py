@@ -0,0 +1,77 @@
+from dataclasses import replace
+from typing import Any, AsyncIterator
+from agents import FunctionTool
+from agents.models.openai_responses import OpenAIResponsesModel
+from hitl_shared.prompt_cache import (PromptCacheStats, canonical,
+                                      sort_by_name, stable_text)
+from openai.types.responses import ResponseCompletedEvent
+
+
+class StablePrefixModel(OpenAIResponsesModel):
+    """
+    Responses model that assembles every request the same way: the
+    system prompt normalized, tools and handoffs sorted by name and tool
+    schemas canonically serialized, so turns and agents sharing a prefix
+    hit the provider's prompt cache. The cache usage of every response,
+    streamed or not, is recorded in stats.
+
+    Args:
+        model: model name
+        openai_client: client the requests are sent with
+        stats: where cache hits and prefix changes are counted
+    """
+
+    def __init__(self, model: str, openai_client: Any,
+                 stats: PromptCacheStats):
+        super().__init__(model, openai_client)
+        self.stats = stats
+        self._schemas: dict[int, tuple[FunctionTool, FunctionTool]] = {}
+
+    def _stable_tool(self, tool: Any) -> Any:
+        if not isinstance(tool, FunctionTool):
+            return tool
+        # the canonical copy is made once per tool
+        cached = self._schemas.get(id(tool))
+        if cached is None or cached[0] is not tool:
+            cached = (tool, replace(
+                tool, params_json_schema=canonical(tool.params_json_schema)))
+            self._schemas[id(tool)] = cached
+        return cached[1]
+
+    async def _record_stream(self, stream: Any
+                             ) -> AsyncIterator[Any]:
+        async for event in stream:
+            if isinstance(event, ResponseCompletedEvent):
+                self.stats.record(event.response.usage)
+            yield event
+
+    # the SDK keeps the cached token count out of ModelResponse.usage,
+    # _fetch_response is the one place that sees the whole response. It is
+    # a private SDK method, this signature matches openai-agents 0.0.6
+    async def _fetch_response(self,
+                              system_instructions: str | None,
+                              input: Any,
+                              model_settings: Any,
+                              tools: list[Any],
+                              output_schema: Any,
+                              handoffs: list[Any],
+                              stream: bool = False) -> Any:
+        if system_instructions is not None:
+            system_instructions = stable_text(system_instructions)
+        tools = [self._stable_tool(tool) for tool in sort_by_name(tools)]
+        handoffs = sort_by_name(handoffs, lambda handoff: handoff.tool_name)
+        label = ",".join([tool.name for tool in tools]
+                         + [handoff.tool_name for handoff in handoffs])
+        if not self.stats.check_prefix(
+                label or "no tools", system_instructions,
+                [getattr(tool, "params_json_schema", tool.name)
+                 for tool in tools]):
+            print(f"### prompt prefix of the agent with tools {label}"
+                  " changed, its prompt cache starts over")
+        response = await super()._fetch_response(
+            system_instructions, input, model_settings, tools,
+            output_schema, handoffs, stream=stream)
+        if stream:
+            return self._record_stream(response)
+        self.stats.record(response.usage)
+        return response
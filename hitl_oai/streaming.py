@@ -0,0 +1,191 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Protocol
+from agents import Agent, Runner, TResponseInputItem
+from agents.result import RunResultStreaming
+from hitl_shared.approvals import ApprovalBroker, ApprovalRequest
+import asyncio
+import json
+import time
+
+
+@dataclass(slots=True)
+class TurnTimings:
+    """When a streamed turn started, showed its first token and ended,
+    monotonic seconds"""
+
+    started: float = field(default_factory=time.monotonic)
+    first_token: float | None = None
+    ended: float | None = None
+
+    @property
+    def ttft(self) -> float | None:
+        """Time to first token, None if the turn produced no text"""
+        if self.first_token is None:
+            return None
+        return self.first_token - self.started
+
+    @property
+    def duration(self) -> float | None:
+        if self.ended is None:
+            return None
+        return self.ended - self.started
+
+
+class StreamSink(Protocol):
+    def send(self, event: str, data: dict[str, Any]) -> None: ...
+
+
+class ConsoleStream:
+    """Prints text as it arrives and one line per handoff, tool call and
+    approval request"""
+
+    def send(self, event: str, data: dict[str, Any]) -> None:
+        if event == "text":
+            print(data["delta"], end="", flush=True)
+        elif event == "handoff":
+            print(f"\n### {data['source']} handed off to {data['target']}")
+        elif event == "tool_called":
+            print(f"\n### {data['agent']} called {data['tool']}")
+        elif event == "tool_output":
+            print(f"### {data['tool']} returned")
+        elif event == "approval":
+            print(f"\n### waiting for approval of {data['tool_name']}")
+        elif event == "turn_end":
+            ttft = data["ttft"]
+            print(f"\n### first token after"
+                  f" {'-' if ttft is None else f'{ttft:.2f}s'},"
+                  f" turn took {data['duration']:.2f}s")
+
+
+class SseStream:
+    """
+    Local server-sent events endpoint with the same events as the console:
+
+        GET /events    text, agent, handoff, tool_called, tool_output,
+                       approval and turn_end events, data is JSON
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8767):
+        self.host = host
+        self.port = port
+        self._server: asyncio.Server | None = None
+        self._streams: set[asyncio.StreamWriter] = set()
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle,
+                                                  self.host, self.port)
+
+    async def close(self) -> None:
+        for writer in self._streams:
+            writer.close()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def send(self, event: str, data: dict[str, Any]) -> None:
+        message = (f"event: {event}\n"
+                   f"data: {json.dumps(data, default=str)}\n\n").encode()
+        for writer in list(self._streams):
+            if writer.is_closing():
+                self._streams.discard(writer)
+                continue
+            writer.write(message)
+
+    async def _handle(self, reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter) -> None:
+        try:
+            method, path, _ = (await reader.readline()).decode().split(" ", 2)
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+        except ValueError:
+            writer.close()
+            return
+        if method == "GET" and path.split("?")[0].rstrip("/") == "/events":
+            writer.write(b"HTTP/1.1 200 OK\r\n"
+                         b"Content-Type: text/event-stream\r\n"
+                         b"Cache-Control: no-cache\r\n\r\n")
+            self._streams.add(writer)
+        else:
+            writer.write(b"HTTP/1.1 404 Not Found\r\n"
+                         b"Content-Length: 0\r\n"
+                         b"Connection: close\r\n\r\n")
+            await writer.drain()
+            writer.close()
+
+
+class TurnStreamer:
+    """
+    Runs turns with Runner.run_streamed and forwards what happens to the
+    sinks as it happens: text deltas, the running agent and handoffs,
+    tool calls and their outputs, and approval requests of the
+    broker. Every turn ends with a turn_end event carrying its time to
+    first token, the timings of the last max_turns turns are kept in
+    timings.
+
+    Args:
+        sinks: where the events go, e.g. ConsoleStream and SseStream
+        broker: approval requests of this broker are forwarded too
+        max_turns: turns kept in timings, older ones are dropped
+    """
+
+    def __init__(self,
+                 sinks: list[StreamSink],
+                 broker: ApprovalBroker | None = None,
+                 max_turns: int = 1024):
+        self.sinks = sinks
+        self.timings: deque[TurnTimings] = deque(maxlen=max_turns)
+        if broker is not None:
+            broker.subscribe(self._on_approval)
+
+    def _emit(self, event: str, data: dict[str, Any]) -> None:
+        for sink in self.sinks:
+            sink.send(event, data)
+
+    def _on_approval(self, request: ApprovalRequest) -> None:
+        self._emit("approval", request.to_dict())
+
+    async def run(self,
+                  agent: Agent,
+                  input: str | list[TResponseInputItem],
+                  context: Any = None) -> RunResultStreaming:
+        """
+        Run and stream one turn
+
+        Returns:
+            RunResultStreaming: the completed run, e.g. for to_input_list()
+        """
+        timings = TurnTimings()
+        self.timings.append(timings)
+        # tool outputs only carry the call id
+        tool_names: dict[str, str] = {}
+        result = Runner.run_streamed(starting_agent=agent, input=input,
+                                     context=context)
+        try:
+            async for event in result.stream_events():
+                if event.type == "raw_response_event":
+                    if event.data.type == "response.output_text.delta":
+                        if timings.first_token is None:
+                            timings.first_token = time.monotonic()
+                        self._emit("text", {"delta": event.data.delta})
+                elif event.type == "agent_updated_stream_event":
+                    self._emit("agent", {"agent": event.new_agent.name})
+                elif event.name == "handoff_occured":
+                    self._emit("handoff",
+                               {"source": event.item.source_agent.name,
+                                "target": event.item.target_agent.name})
+                elif event.name == "tool_called":
+                    raw = event.item.raw_item
+                    name = getattr(raw, "name", raw.type)
+                    tool_names[getattr(raw, "call_id", "")] = name
+                    self._emit("tool_called", {"agent": event.item.agent.name,
+                                               "tool": name})
+                elif event.name == "tool_output":
+                    call_id = event.item.raw_item.get("call_id", "")
+                    self._emit("tool_output",
+                               {"tool": tool_names.get(call_id, "a tool")})
+        finally:
+            timings.ended = time.monotonic()
+            self._emit("turn_end", {"ttft": timings.ttft,
+                                    "duration": timings.duration})
+        return result
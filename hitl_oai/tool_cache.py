@@ -0,0 +1,31 @@
+import json
+from agents import RunContextWrapper
+from hitl_shared.result_cache import ResultCache
+
+
+async def cached_tool_call(context: RunContextWrapper,
+                           tool_args: str,
+                           tool_name: str,
+                           callback,
+                           cache: ResultCache) -> str:
+    """
+    Serve a tool call from the result cache when possible
+
+    Args:
+        context: OpenAI Agents SDK run context, must hold the user_id
+        tool_args: parameters for the function, JSON as a string.
+        tool_name: the name of the tool that we want to call
+        callback: the function that we should call on a cache miss
+        cache: the result cache shared by the agents
+
+    Returns:
+        str: The output of the tool call
+    """
+    user_id = context.context["user_id"]
+    args = json.loads(tool_args or "{}")
+    cached = cache.get(user_id, tool_name, args)
+    if cached is not ResultCache.MISS:
+        return cached
+    result = await callback(context, tool_args)
+    cache.record(user_id, tool_name, args, result)
+    return result
@@ -0,0 +1,39 @@
+from agents import RunContextWrapper
+from hitl_shared.metrics import HitlMetrics
+import time
+
+
+async def timed_tool_call(context: RunContextWrapper,
+                          tool_args: str,
+                          agent_name: str,
+                          tool_name: str,
+                          callback,
+                          metrics: HitlMetrics) -> str:
+    """
+    Time a tool call in metrics, a call that raises counts as failed
+
+    Wrap the tool's own callback, inside confirm_tool_usage, so the time
+    spent waiting on a human isn't part of the tool's latency. The SDK's
+    on_tool_start hook can't do this: it runs while the approval is
+    pending.
+
+    Args:
+        context: OpenAI Agents SDK run context
+        tool_args: parameters for the function, JSON as a string.
+        agent_name: the agent the tool belongs to
+        tool_name: the name of the tool that we want to call
+        callback: the function that is timed
+        metrics: where the measurements go
+
+    Returns:
+        str: The output of the tool call
+    """
+    started = time.monotonic()
+    try:
+        result = await callback(context, tool_args)
+    except Exception:
+        metrics.tool_call(agent_name, tool_name,
+                          time.monotonic() - started, failed=True)
+        raise
+    metrics.tool_call(agent_name, tool_name, time.monotonic() - started)
+    return result
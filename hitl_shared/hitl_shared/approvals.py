@@ -0,0 +1,700 @@
+from dataclasses import dataclass, field
+from collections import OrderedDict, deque
+from pprint import pformat
+from typing import Any, Callable
+from urllib.parse import parse_qs, unquote, urlsplit
+from uuid import uuid4
+import asyncio
+import hmac
+import json
+import os
+import secrets
+import sys
+import time
+
+
+@dataclass(slots=True)
+class ApprovalRequest:
+    """A tool call waiting for a human decision"""
+
+    id: str
+    session_id: str
+    call_id: str
+    tool_name: str
+    args: Any
+    future: asyncio.Future
+    created_at: float = field(default_factory=time.time)
+    # set when the reviewer also approved similar calls for a while
+    grant_minutes: float | None = None
+    # seconds reviewers have to decide, then on_timeout applies:
+    # "deny", "approve" or "escalate" (ask again, then deny)
+    deadline: float | None = None
+    on_timeout: str = "deny"
+    # wall-clock time the current deadline passes, kept across restarts
+    expires_at: float | None = None
+    escalations: int = 0
+    timed_out: bool = False
+    timer: asyncio.TimerHandle | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"id": self.id,
+                "session_id": self.session_id,
+                "call_id": self.call_id,
+                "tool_name": self.tool_name,
+                "args": self.args,
+                "created_at": self.created_at,
+                "grant_minutes": self.grant_minutes,
+                "deadline": self.deadline,
+                "on_timeout": self.on_timeout,
+                "expires_at": self.expires_at,
+                "escalations": self.escalations}
+
+
+EXACT = "exact"
+RECIPIENT = "recipient"
+TOOL = "tool"
+
+# arguments naming who a tool call reaches, for the RECIPIENT scope
+DEFAULT_RECIPIENT_FIELDS = {
+    "Google_SendEmail": ("recipient", "cc", "bcc"),
+    "Slack_SendDmToUser": ("user_name",),
+}
+
+
+def _normalize_args(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _normalize_args(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize_args(v) for v in value]
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+class ApprovalMemo:
+    """
+    Remembers the decisions taken in each session, so a repeated call is
+    decided without asking again.
+
+    An approval covers later calls with the same scope key:
+
+    - EXACT: the same tool with the same (normalized) arguments
+    - RECIPIENT: the same tool reaching the same recipients, tools without
+      recipient fields fall back to EXACT
+    - TOOL: any call to the same tool
+
+    Denials only cover the exact same call. Decisions expire after ttl
+    seconds and can be revoked per session and tool.
+
+    Args:
+        scope: default scope of approvals
+        scopes: scope per tool name, overriding the default
+        ttl: seconds a decision is remembered
+        recipient_fields: tool name to the arguments naming recipients
+        max_sessions: sessions kept, least recently used ones are dropped
+    """
+
+    def __init__(self,
+                 scope: str = EXACT,
+                 scopes: dict[str, str] | None = None,
+                 ttl: float = 30 * 60,
+                 recipient_fields: dict[str, tuple[str, ...]] | None = None,
+                 max_sessions: int = 10_000):
+        self.scope = scope
+        self.scopes = {k.replace(".", "_"): v for k, v in (scopes or {}).items()}
+        self.ttl = ttl
+        self.recipient_fields = {
+            k.replace(".", "_"): v
+            for k, v in (DEFAULT_RECIPIENT_FIELDS if recipient_fields is None
+                         else recipient_fields).items()}
+        self.max_sessions = max_sessions
+        self._sessions: OrderedDict[
+            str, dict[tuple[str, str, str], tuple[float, bool]]] = OrderedDict()
+
+    def _keys(self, tool_name: str, args: Any) -> dict[str, tuple]:
+        """The lookup key of the call under each scope"""
+        args = _normalize_args(args)
+        exact = json.dumps(args, sort_keys=True, separators=(",", ":"),
+                           default=str)
+        keys = {EXACT: (tool_name, EXACT, exact),
+                TOOL: (tool_name, TOOL, "")}
+        fields = self.recipient_fields.get(tool_name)
+        if fields and isinstance(args, dict):
+            recipients = json.dumps(
+                [str(args.get(name) or "").lower() for name in fields])
+            keys[RECIPIENT] = (tool_name, RECIPIENT, recipients)
+        else:
+            keys[RECIPIENT] = keys[EXACT]
+        return keys
+
+    def lookup(self, session_id: str, tool_name: str, args: Any) -> bool | None:
+        """The remembered decision for the call, None if there is none"""
+        decisions = self._sessions.get(session_id)
+        if not decisions:
+            return None
+        self._sessions.move_to_end(session_id)
+        now = time.monotonic()
+        # an exact denial wins over a broader approval
+        for key in self._keys(tool_name.replace(".", "_"), args).values():
+            entry = decisions.get(key)
+            if entry is None:
+                continue
+            if entry[0] <= now:
+                del decisions[key]
+                continue
+            return entry[1]
+        return None
+
+    def remember(self,
+                 session_id: str,
+                 tool_name: str,
+                 args: Any,
+                 approved: bool) -> None:
+        tool_name = tool_name.replace(".", "_")
+        scope = self.scopes.get(tool_name, self.scope) if approved else EXACT
+        key = self._keys(tool_name, args)[scope]
+        decisions = self._sessions.setdefault(session_id, {})
+        decisions[key] = (time.monotonic() + self.ttl, approved)
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def revoke(self, session_id: str, tool_name: str | None = None) -> None:
+        """Forget the session's decisions, optionally only for one tool"""
+        if tool_name is None:
+            self._sessions.pop(session_id, None)
+            return
+        tool_name = tool_name.replace(".", "_")
+        decisions = self._sessions.get(session_id, {})
+        for key in [key for key in decisions if key[0] == tool_name]:
+            del decisions[key]
+
+
+class ApprovalBrokerFull(RuntimeError):
+    """Raised when the broker already holds max_pending approvals"""
+
+
+class ApprovalBroker:
+    """
+    Holds pending approvals as futures, so any number of them can wait at
+    the same time without blocking the event loop or holding a thread.
+
+    Requests are keyed by (session_id, call_id): lookups and decisions are
+    O(1), submitting the same tool call twice (e.g. a graph node that is
+    re-executed) joins the pending request, and at most max_pending
+    requests are held at once. Backends (console, HTTP, ...) subscribe to
+    new requests and call resolve with the human's decision. With a memo,
+    calls already decided in the session are answered without asking.
+
+    Requests with a deadline are decided by their on_timeout action once it
+    passes, so abandoned approvals don't pin their session forever. An
+    escalated request is sent to the backends again with a new deadline,
+    up to max_escalations times, and then denied.
+
+    Args:
+        max_pending: approvals held at once
+        memo: remembers each session's decisions
+        deadline: default seconds to decide, None waits forever
+        max_escalations: times a request can be escalated before denial
+    """
+
+    def __init__(self,
+                 max_pending: int = 50_000,
+                 memo: ApprovalMemo | None = None,
+                 deadline: float | None = None,
+                 max_escalations: int = 1):
+        self.max_pending = max_pending
+        self.memo = memo
+        self.deadline = deadline
+        self.max_escalations = max_escalations
+        # a DurableStore keeping the pending approvals, see persist_to
+        self.store = None
+        self._pending: dict[str, ApprovalRequest] = {}
+        # insertion-ordered request ids of each session
+        self._sessions: dict[str, dict[str, None]] = {}
+        self._listeners: list[Callable[[ApprovalRequest], None]] = []
+
+    @staticmethod
+    def key(session_id: str, call_id: str) -> str:
+        return f"{session_id}:{call_id}"
+
+    def persist_to(self, store) -> int:
+        """
+        Keep pending approvals in a DurableStore. Approvals that were still
+        pending when the process stopped are submitted again, their
+        decisions reach the session through the memo when the call is
+        retried, or the LangGraph thread waiting on them.
+
+        Returns:
+            int: the number of approvals restored
+        """
+        self.store = store
+        restored = 0
+        for _, request_id, value in store.items("approval"):
+            if request_id in self._pending:
+                continue
+            record = json.loads(value)
+            # the time left is what remained when the process stopped
+            expires_at = record.get("expires_at")
+            if expires_at is None and record["deadline"] is not None:
+                expires_at = record["created_at"] + record["deadline"]
+            self.submit(record["tool_name"], record["args"],
+                        record["session_id"], record["call_id"],
+                        record["deadline"], record["on_timeout"],
+                        expires_at=expires_at,
+                        escalations=record.get("escalations", 0))
+            restored += 1
+        return restored
+
+    def subscribe(self, listener: Callable[[ApprovalRequest], None]) -> None:
+        self._listeners.append(listener)
+
+    def get(self, request_id: str) -> ApprovalRequest | None:
+        return self._pending.get(request_id)
+
+    def pending(self, session_id: str | None = None) -> list[ApprovalRequest]:
+        if session_id is None:
+            return list(self._pending.values())
+        return [self._pending[request_id]
+                for request_id in self._sessions.get(session_id, ())]
+
+    def submit(self,
+               tool_name: str,
+               args: Any,
+               session_id: str = "default",
+               call_id: str | None = None,
+               deadline: float | None = None,
+               on_timeout: str = "deny",
+               *,
+               expires_at: float | None = None,
+               escalations: int = 0) -> ApprovalRequest:
+        """
+        Register a tool call for approval without waiting for the decision
+
+        Args:
+            deadline: seconds to decide, defaults to the broker's deadline
+            on_timeout: "deny", "approve" or "escalate" once it passes
+            expires_at: wall-clock time the first deadline passes instead
+                of deadline seconds from now, for restored approvals
+            escalations: times the request was already escalated
+
+        Raises:
+            ApprovalBrokerFull: too many approvals are already pending
+        """
+        call_id = call_id or uuid4().hex
+        request_id = self.key(session_id, call_id)
+        request = self._pending.get(request_id)
+        if request is not None:
+            return request
+        remembered = (None if self.memo is None
+                      else self.memo.lookup(session_id, tool_name, args))
+        if remembered is not None:
+            # decided earlier in the session, nobody needs to be asked
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(remembered)
+            return ApprovalRequest(request_id, session_id, call_id,
+                                   tool_name, args, future)
+        if len(self._pending) >= self.max_pending:
+            raise ApprovalBrokerFull(
+                f"{self.max_pending} approvals are already pending")
+
+        request = ApprovalRequest(
+            id=request_id,
+            session_id=session_id,
+            call_id=call_id,
+            tool_name=tool_name,
+            args=args,
+            future=asyncio.get_running_loop().create_future(),
+            deadline=self.deadline if deadline is None else deadline,
+            on_timeout=on_timeout,
+            expires_at=expires_at,
+            escalations=escalations,
+        )
+        self._pending[request_id] = request
+        self._sessions.setdefault(session_id, {})[request_id] = None
+        # decided, cancelled or abandoned, the request stops taking memory
+        request.future.add_done_callback(lambda _: self._forget(request))
+        self._notify(request)
+        return request
+
+    def _notify(self, request: ApprovalRequest) -> None:
+        if request.deadline is not None:
+            if request.expires_at is None:
+                request.expires_at = time.time() + request.deadline
+            request.timer = asyncio.get_running_loop().call_later(
+                max(0.0, request.expires_at - time.time()),
+                self._expire, request)
+        if self.store is not None:
+            self.store.put("approval", request.session_id, request.id,
+                           json.dumps(request.to_dict(), default=str))
+        for listener in self._listeners:
+            listener(request)
+
+    def _expire(self, request: ApprovalRequest) -> None:
+        if request.future.done():
+            return
+        if (request.on_timeout == "escalate"
+                and request.escalations < self.max_escalations):
+            request.escalations += 1
+            request.expires_at = None
+            self._notify(request)
+            return
+        request.timed_out = True
+        # nobody decided, so the outcome isn't remembered
+        request.future.set_result(request.on_timeout == "approve")
+
+    def close_session(self, session_id: str) -> None:
+        """
+        Deny whatever the session still waits for and forget its decisions,
+        for sessions that ended or were abandoned
+        """
+        for request in self.pending(session_id):
+            if not request.future.done():
+                request.timed_out = True
+                request.future.set_result(False)
+        if self.memo is not None:
+            self.memo.revoke(session_id)
+
+    def _forget(self, request: ApprovalRequest) -> None:
+        if request.timer is not None:
+            request.timer.cancel()
+        if self.store is not None:
+            self.store.delete("approval", request.session_id, request.id)
+        self._pending.pop(request.id, None)
+        session = self._sessions.get(request.session_id)
+        if session is not None:
+            session.pop(request.id, None)
+            if not session:
+                del self._sessions[request.session_id]
+
+    async def request(self,
+                      tool_name: str,
+                      args: Any,
+                      session_id: str = "default",
+                      call_id: str | None = None,
+                      deadline: float | None = None,
+                      on_timeout: str = "deny") -> bool:
+        """
+        Wait for a human to approve or deny a tool call
+
+        Returns:
+            bool: True if the call was approved
+        """
+        request = self.submit(tool_name, args, session_id, call_id,
+                              deadline, on_timeout)
+        return await request.future
+
+    async def request_many(self,
+                           calls: list[tuple[Any, ...]],
+                           session_id: str = "default") -> list[bool]:
+        """
+        Submit several (tool_name, args, call_id) calls at once, so
+        backends can present them together, and wait for every decision.
+        A call can also set its deadline and on_timeout, as in submit:
+        (tool_name, args, call_id, deadline, on_timeout).
+
+        Returns:
+            list[bool]: one decision per call, in order
+        """
+        requests = [self.submit(tool_name, args, session_id, call_id, *timeout)
+                    for tool_name, args, call_id, *timeout in calls]
+        return list(await asyncio.gather(*[r.future for r in requests]))
+
+    def resolve(self,
+                request_id: str,
+                approved: bool,
+                grant_minutes: float | None = None) -> bool:
+        """
+        Record a decision, returns False if the request is no longer pending
+
+        Args:
+            grant_minutes: approve similar calls for this many minutes too,
+                applied by the caller's ApprovalPolicy
+        """
+        request = self._pending.get(request_id)
+        if request is None or request.future.done():
+            return False
+        if approved:
+            request.grant_minutes = grant_minutes
+        if self.memo is not None:
+            self.memo.remember(request.session_id, request.tool_name,
+                               request.args, approved)
+        request.future.set_result(approved)
+        return True
+
+
+async def _readline(prompt: str) -> str | None:
+    """input() for the event loop, waits for stdin to be readable instead
+    of blocking the loop. Returns None once stdin is closed"""
+    print(prompt, end="", flush=True)
+    loop = asyncio.get_running_loop()
+    line = loop.create_future()
+    fd = sys.stdin.fileno()
+
+    def on_readable():
+        if not line.done():
+            line.set_result(sys.stdin.readline())
+
+    loop.add_reader(fd, on_readable)
+    try:
+        answer = await line
+    finally:
+        loop.remove_reader(fd)
+    return answer.strip().lower() if answer else None
+
+
+def _parse_decisions(answer: str | None, count: int) -> list[str] | None:
+    """One of y/n/a for every call, or None if the answer doesn't parse"""
+    if answer is None:
+        # nobody is left to answer once stdin is closed, deny
+        return ["n"] * count
+    if answer in ["y", "n", "a"]:
+        return [answer] * count
+    answers = answer.replace(",", " ").split()
+    if len(answers) == 1 and len(answers[0]) == count:
+        answers = list(answers[0])
+    if len(answers) != count or any(a not in ["y", "n", "a"] for a in answers):
+        return None
+    return answers
+
+
+class StdinApprovalBackend:
+    """
+    Asks for pending approvals on the console. stdin is only read while
+    something is pending, so it doesn't compete with the chat prompt.
+
+    Requests arriving within batch_window seconds of each other, like the
+    parallel tool calls of one agent step, are shown together and answered
+    with a single response: y/n for all of them, or one y/n per call.
+    Answering "a" approves the call and similar ones for grant_minutes.
+    """
+
+    def __init__(self,
+                 broker: ApprovalBroker,
+                 batch_window: float = 0.05,
+                 grant_minutes: float = 10):
+        self.broker = broker
+        self.batch_window = batch_window
+        self.grant_minutes = grant_minutes
+        self._queue: deque[str] = deque()
+        self._task: asyncio.Task | None = None
+        broker.subscribe(self._on_request)
+
+    def _on_request(self, request: ApprovalRequest) -> None:
+        self._queue.append(request.id)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._serve())
+
+    async def _ask(self, requests: list[ApprovalRequest]) -> list[str]:
+        if len(requests) == 1:
+            print("\nThe agent requires permission:\n"
+                  f"I'm about to call {requests[0].tool_name}"
+                  " with these arguments:")
+            print(pformat(requests[0].args))
+            answer = await _readline(
+                "Your response [y/n, a to allow similar calls for"
+                f" {self.grant_minutes:g} minutes]: ")
+            while (decisions := _parse_decisions(answer, 1)) is None:
+                answer = await _readline(
+                    "Your response (must be either y, n or a): ")
+            return decisions
+
+        print("\nThe agent requires permission for these calls:")
+        for i, request in enumerate(requests, 1):
+            print(f"[{i}] {request.tool_name} with these arguments:")
+            print(pformat(request.args))
+        answer = await _readline(
+            "Your response [y/n/a for all, or one per call like 'y n a']: ")
+        while (decisions := _parse_decisions(answer, len(requests))) is None:
+            answer = await _readline(
+                f"Your response (y, n, a or {len(requests)} y/n/a answers): ")
+        return decisions
+
+    async def _serve(self) -> None:
+        # give the rest of the step's calls a moment to arrive
+        await asyncio.sleep(self.batch_window)
+        while self._queue:
+            requests = [self.broker.get(request_id)
+                        for request_id in self._queue]
+            self._queue.clear()
+            # some may already be answered through another backend
+            requests = [r for r in requests if r is not None]
+            if not requests:
+                continue
+            ask = asyncio.ensure_future(self._ask(requests))
+            futures = [r.future for r in requests]
+            while not ask.done() and not all(f.done() for f in futures):
+                await asyncio.wait({ask, *[f for f in futures if not f.done()]},
+                                   return_when=asyncio.FIRST_COMPLETED)
+            if ask.done():
+                for request, answer in zip(requests, ask.result()):
+                    self.broker.resolve(
+                        request.id, answer != "n",
+                        self.grant_minutes if answer == "a" else None)
+            else:
+                ask.cancel()
+                if any(r.timed_out for r in requests):
+                    print("\nNo answer before the deadline, applied the"
+                          " default action")
+                else:
+                    print("\nThese calls were answered elsewhere")
+
+
+class HttpApprovalBackend:
+    """
+    Local HTTP API for reviewers:
+
+        GET  /approvals               pending approvals as JSON
+        GET  /approvals?session=<id>  pending approvals of one session
+        GET  /approvals/events        server-sent events for new approvals
+        POST /approvals/<id>/approve
+        POST /approvals/<id>/approve?minutes=<n>  also approve similar calls
+        POST /approvals/<id>/deny
+        DELETE /sessions/<id>/memo    forget the session's decisions
+        DELETE /sessions/<id>/memo?tool=<name>
+
+    Every request needs an ``Authorization: Bearer <token>`` header and a
+    Host header naming this server, so neither another local process nor a
+    web page (DNS rebinding) can approve tool calls.
+    """
+
+    def __init__(self,
+                 broker: ApprovalBroker,
+                 host: str = "127.0.0.1",
+                 port: int = 8765,
+                 token: str | None = None):
+        """
+        Args:
+            broker: the broker whose approvals are served.
+            host: interface to listen on.
+            port: port to listen on.
+            token: bearer token reviewers send, defaults to
+                HITL_APPROVALS_TOKEN or a random one printed at startup.
+        """
+        self.broker = broker
+        self.host = host
+        self.port = port
+        self.token = token or os.getenv("HITL_APPROVALS_TOKEN")
+        self._print_token = self.token is None
+        if self.token is None:
+            self.token = secrets.token_urlsafe(24)
+        self.allowed_hosts = {host, "localhost", "127.0.0.1", "::1"}
+        self._server: asyncio.Server | None = None
+        self._streams: set[asyncio.StreamWriter] = set()
+        broker.subscribe(self._on_request)
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle,
+                                                  self.host, self.port)
+        if self._print_token:
+            print(f"approvals at http://{self.host}:{self.port}/approvals,"
+                  f" token: {self.token}")
+
+    async def close(self) -> None:
+        for writer in self._streams:
+            writer.close()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def _on_request(self, request: ApprovalRequest) -> None:
+        event = f"data: {json.dumps(request.to_dict(), default=str)}\n\n"
+        for writer in list(self._streams):
+            if writer.is_closing():
+                self._streams.discard(writer)
+                continue
+            writer.write(event.encode())
+
+    async def _respond(self, writer: asyncio.StreamWriter,
+                       status: str, payload: Any) -> None:
+        body = json.dumps(payload, default=str).encode()
+        writer.write(f"HTTP/1.1 {status}\r\n"
+                     "Content-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     "Connection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+        writer.close()
+
+    async def _handle(self, reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter) -> None:
+        try:
+            method, path, _ = (await reader.readline()).decode().split(" ", 2)
+            headers = {}
+            # any body is not needed
+            while (line := await reader.readline()).strip():
+                name, _, value = line.decode().partition(":")
+                headers[name.strip().lower()] = value.strip()
+        except (ValueError, UnicodeDecodeError):
+            await self._respond(writer, "400 Bad Request", {"error": "bad request"})
+            return
+
+        if not self._trusted_host(headers.get("host", "")):
+            await self._respond(writer, "403 Forbidden", {"error": "unknown host"})
+            return
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        if (scheme.lower() != "bearer"
+                or not hmac.compare_digest(token.strip().encode(),
+                                           self.token.encode())):
+            await self._respond(writer, "401 Unauthorized",
+                                {"error": "missing or wrong bearer token"})
+            return
+
+        url = urlsplit(path)
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+        if method == "GET" and parts == ["approvals"]:
+            session_id = parse_qs(url.query).get("session", [None])[0]
+            await self._respond(writer, "200 OK",
+                                [r.to_dict()
+                                 for r in self.broker.pending(session_id)])
+        elif method == "GET" and parts == ["approvals", "events"]:
+            writer.write(b"HTTP/1.1 200 OK\r\n"
+                         b"Content-Type: text/event-stream\r\n"
+                         b"Cache-Control: no-cache\r\n\r\n")
+            self._streams.add(writer)
+        elif (method == "POST" and len(parts) == 3
+              and parts[0] == "approvals" and parts[2] in ("approve", "deny")):
+            minutes = parse_qs(url.query).get("minutes", [None])[0]
+            try:
+                minutes = float(minutes) if minutes else None
+            except ValueError:
+                await self._respond(writer, "400 Bad Request",
+                                    {"error": "minutes must be a number"})
+                return
+            if self.broker.resolve(parts[1], parts[2] == "approve", minutes):
+                await self._respond(writer, "200 OK", {"ok": True})
+            else:
+                await self._respond(writer, "404 Not Found",
+                                    {"error": "no such pending approval"})
+        elif (method == "DELETE" and len(parts) == 3
+              and parts[0] == "sessions" and parts[2] == "memo"
+              and self.broker.memo is not None):
+            tool_name = parse_qs(url.query).get("tool", [None])[0]
+            self.broker.memo.revoke(parts[1], tool_name)
+            await self._respond(writer, "200 OK", {"ok": True})
+        else:
+            await self._respond(writer, "404 Not Found", {"error": "not found"})
+
+    def _trusted_host(self, host: str) -> bool:
+        """Whether a Host header names this server, e.g. localhost:8765"""
+        name, port = host, "80"
+        if ":" in host and not host.endswith("]"):
+            name, _, port = host.rpartition(":")
+        return (name.strip("[]") in self.allowed_hosts
+                and port == str(self.port))
+
+
+_default_broker: ApprovalBroker | None = None
+
+
+def get_approval_broker() -> ApprovalBroker:
+    """
+    The process-wide broker used by confirm_tool_usage, created on first use
+    with a console backend attached and a memo of each session's decisions
+    """
+    global _default_broker
+    if _default_broker is None:
+        # DMs to someone already approved in the session go through
+        _default_broker = ApprovalBroker(
+            memo=ApprovalMemo(scopes={"Slack_SendDmToUser": RECIPIENT}))
+        StdinApprovalBackend(_default_broker)
+    return _default_broker
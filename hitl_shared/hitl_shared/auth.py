@@ -0,0 +1,63 @@
+from arcadepy import AsyncArcade
+from arcadepy.types.shared import AuthorizationResponse
+import asyncio
+
+
+async def auth_tools(client: AsyncArcade,
+                     tool_names: list[str],
+                     user_id: str,
+                     max_concurrency: int = 8) -> dict[str, str]:
+    """
+    Authorize several tools at once
+
+    The authorize calls are issued concurrently (at most max_concurrency in
+    flight). Pending tools are grouped by auth provider and scopes, the user
+    gets a single link per group, and one wait_for_completion is shared by
+    the whole group before its remaining tools are checked again.
+
+    Args:
+        client: AsyncArcade client
+        tool_names: the names of the tools to authorize
+        user_id: the user the tools are authorized for
+        max_concurrency: maximum number of concurrent authorize calls
+
+    Returns:
+        dict[str, str]: the final authorization status of each tool
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def authorize(tool_name: str) -> AuthorizationResponse:
+        async with semaphore:
+            return await client.tools.authorize(tool_name=tool_name,
+                                                user_id=user_id)
+
+    tool_names = list(dict.fromkeys(tool_names))
+    responses = await asyncio.gather(*[authorize(t) for t in tool_names])
+    statuses = {}
+    pending: dict[tuple, list[tuple[str, AuthorizationResponse]]] = {}
+    for tool_name, result in zip(tool_names, responses):
+        statuses[tool_name] = result.status
+        if result.status != "completed":
+            key = (result.provider_id, tuple(sorted(result.scopes or [])))
+            pending.setdefault(key, []).append((tool_name, result))
+
+    async def complete(group: list[tuple[str, AuthorizationResponse]]):
+        names = ", ".join(tool_name for tool_name, _ in group)
+        tool_name, result = group[0]
+        print(f"Click this link to authorize {names}:\n{result.url}")
+        result = await client.auth.wait_for_completion(result)
+        statuses[tool_name] = result.status
+        # the grant normally covers the whole group, anything left over
+        # falls back to its own link
+        await asyncio.gather(*[recheck(tool_name)
+                               for tool_name, _ in group[1:]])
+
+    async def recheck(tool_name: str):
+        result = await authorize(tool_name)
+        if result.status != "completed":
+            print(f"Click this link to authorize {tool_name}:\n{result.url}")
+            result = await client.auth.wait_for_completion(result)
+        statuses[tool_name] = result.status
+
+    await asyncio.gather(*[complete(group) for group in pending.values()])
+    return statuses
@@ -0,0 +1,174 @@
+from pathlib import Path
+from typing import Any
+import logging
+import os
+import queue
+import sqlite3
+import threading
+
+
+DEFAULT_STATE_PATH = Path(os.getenv("HITL_STATE_PATH", "hitl_state.sqlite3"))
+
+logger = logging.getLogger(__name__)
+
+
+class DurableStore:
+    """
+    Local SQLite store for conversation state that has to survive restarts:
+    sessions, checkpoints, history and pending approvals.
+
+    Two shapes of data are kept, both grouped by a scope (a session or a
+    thread) so a whole conversation can be loaded or dropped at once:
+
+    - records: (kind, scope, key) -> value, overwritten by put
+    - logs: values appended to (kind, scope) and read back in order
+
+    Writes only enqueue the operation, a background thread commits
+    whatever is queued in one transaction, so persistence stays off the
+    request path and bursts of writes share a commit. Reads flush first.
+
+    Args:
+        path: database file, defaults to HITL_STATE_PATH or
+            ./hitl_state.sqlite3
+        batch_size: maximum operations committed per transaction
+    """
+
+    def __init__(self, path: str | Path | None = None, batch_size: int = 512):
+        self.path = Path(path) if path else DEFAULT_STATE_PATH
+        self.batch_size = batch_size
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._reader = sqlite3.connect(self.path, check_same_thread=False)
+        self._reader.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS records (
+                kind TEXT, scope TEXT, key TEXT, value BLOB,
+                PRIMARY KEY (kind, scope, key)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT, scope TEXT, value BLOB
+            );
+            CREATE INDEX IF NOT EXISTS log_scope ON log (kind, scope, seq);
+        """)
+        self._writer = threading.Thread(target=self._write_loop,
+                                        name="durable-store-writer",
+                                        daemon=True)
+        self._writer.start()
+
+    def _write_loop(self) -> None:
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        closing = False
+        while not closing:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            done = [args for op, *args in batch if op == "flush"]
+            closing = any(op == "close" for op, *_ in batch)
+            error = None
+            try:
+                self._commit(conn, batch)
+            except sqlite3.Error as e:
+                # rolled back, the writer keeps serving the next batches
+                logger.error("durable store: lost a batch of %d writes: %s",
+                             len(batch), e)
+                error = e
+            # only signalled once everything before them is committed
+            for event, errors in done:
+                if error is not None:
+                    errors.append(error)
+                event.set()
+        conn.close()
+
+    @staticmethod
+    def _commit(conn: sqlite3.Connection, batch: list[tuple]) -> None:
+        with conn:
+            for op, *args in batch:
+                if op == "put":
+                    conn.execute("INSERT OR REPLACE INTO records"
+                                 " VALUES (?, ?, ?, ?)", args)
+                elif op == "delete":
+                    conn.execute("DELETE FROM records WHERE kind = ?"
+                                 " AND scope = ? AND key = ?", args)
+                elif op == "delete_scope":
+                    conn.execute("DELETE FROM records WHERE kind = ?"
+                                 " AND scope = ?", args)
+                elif op == "append":
+                    conn.execute("INSERT INTO log (kind, scope, value)"
+                                 " VALUES (?, ?, ?)", args)
+                elif op == "clear":
+                    conn.execute("DELETE FROM log WHERE kind = ?"
+                                 " AND scope = ?", args)
+
+    def put(self, kind: str, scope: str, key: str, value: Any) -> None:
+        self._queue.put(("put", kind, scope, key, value))
+
+    def delete(self, kind: str, scope: str, key: str | None = None) -> None:
+        """Drop one record, or every record of the scope"""
+        if key is None:
+            self._queue.put(("delete_scope", kind, scope))
+        else:
+            self._queue.put(("delete", kind, scope, key))
+
+    def append(self, kind: str, scope: str, value: Any) -> None:
+        self._queue.put(("append", kind, scope, value))
+
+    def clear(self, kind: str, scope: str) -> None:
+        """Drop the log of the scope"""
+        self._queue.put(("clear", kind, scope))
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Wait until every queued write is committed
+
+        Returns:
+            bool: False if the timeout passed first
+
+        Raises:
+            sqlite3.Error: the transaction holding the last queued writes
+                failed, they were not stored
+        """
+        event = threading.Event()
+        errors: list[sqlite3.Error] = []
+        self._queue.put(("flush", event, errors))
+        if not event.wait(timeout):
+            return False
+        if errors:
+            raise errors[0]
+        return True
+
+    def items(self,
+              kind: str,
+              scope: str | None = None) -> list[tuple[str, str, Any]]:
+        """(scope, key, value) of the records, optionally of one scope"""
+        self.flush()
+        query = "SELECT scope, key, value FROM records WHERE kind = ?"
+        params: tuple = (kind,)
+        if scope is not None:
+            query += " AND scope = ?"
+            params += (scope,)
+        with self._lock:
+            return self._reader.execute(query, params).fetchall()
+
+    def log(self, kind: str, scope: str | None = None) -> list[tuple[str, Any]]:
+        """(scope, value) of the logged values in the order they were
+        appended, optionally of one scope"""
+        self.flush()
+        query = "SELECT scope, value FROM log WHERE kind = ?"
+        params: tuple = (kind,)
+        if scope is not None:
+            query += " AND scope = ?"
+            params += (scope,)
+        with self._lock:
+            return self._reader.execute(query + " ORDER BY seq",
+                                        params).fetchall()
+
+    def close(self) -> None:
+        self._queue.put(("close",))
+        self._writer.join()
+        self._reader.close()
+
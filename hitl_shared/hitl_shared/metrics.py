@@ -0,0 +1,256 @@
+from bisect import bisect_left
+from typing import Any
+from hitl_shared.prompt_cache import cache_usage, get_field
+import asyncio
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0, 60.0, 300.0)
+TOKEN_BUCKETS = (64, 256, 1024, 2048, 4096, 8192, 16384, 32768, 65536,
+                 131072)
+
+
+def token_counts(usage: Any) -> dict[str, int]:
+    """
+    Input, output, cached and reasoning tokens of a model call, from the
+    usage shapes understood by cache_usage
+    """
+    counts = {}
+    prompt = cache_usage(usage)
+    if prompt is not None:
+        counts["input"], counts["cached"] = prompt
+    for total, details, reasoning in (
+            ("output_tokens", "output_token_details", "reasoning"),
+            ("output_tokens", "output_tokens_details", "reasoning_tokens"),
+            ("completion_tokens", "completion_tokens_details",
+             "reasoning_tokens"),
+            ("candidates_token_count", None, "thoughts_token_count")):
+        count = get_field(usage, total)
+        if count is None:
+            continue
+        counts["output"] = count
+        value = get_field(usage if details is None else get_field(usage, details),
+                       reasoning)
+        if value is not None:
+            counts["reasoning"] = value
+            break
+    return counts
+
+
+def _escape(value: str) -> str:
+    return (value.replace("\\", "\\\\").replace("\n", "\\n")
+            .replace('"', '\\"'))
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"'
+             for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """
+    Monotonic counter per combination of label values. Updates are a dict
+    lookup and an addition, no lock: they happen on the event loop.
+    """
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels: Any, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}",
+                 f"# TYPE {self.name} counter"]
+        for labels, value in list(self._values.items()):
+            lines.append(f"{self.name}"
+                         f"{_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """
+    Histogram per combination of label values with fixed buckets. An
+    observation finds its bucket with bisect and bumps one count, buckets
+    are only made cumulative when rendered.
+    """
+
+    def __init__(self,
+                 name: str,
+                 help: str,
+                 labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [count per bucket and +Inf, sum]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels: Any) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1),
+                                             0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}",
+                 f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else f"{bound:g}"
+                bucket = _labels(self.labelnames, labels, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+            lines.append(f"{self.name}_sum"
+                         f"{_labels(self.labelnames, labels)} {total:g}")
+            lines.append(f"{self.name}_count"
+                         f"{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: list[Counter | Histogram] = []
+
+    def counter(self, name: str, help: str,
+                labelnames: tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str,
+                  labelnames: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text format"""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class HitlMetrics:
+    """
+    Latency and token metrics of the agents, their tools and handoffs
+
+    Args:
+        registry: where the metrics are registered
+    """
+
+    def __init__(self, registry: MetricsRegistry | None = None):
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+        self.agent_seconds = r.histogram(
+            "hitl_agent_seconds", "Time an agent ran before ending or"
+            " handing off", ("agent",))
+        self.model_seconds = r.histogram(
+            "hitl_model_call_seconds", "Latency of model calls", ("agent",))
+        self.input_tokens = r.histogram(
+            "hitl_model_input_tokens", "Prompt tokens per model call",
+            ("agent",), TOKEN_BUCKETS)
+        self.tokens = r.counter(
+            "hitl_tokens_total", "Tokens by kind: input, cached, output and"
+            " reasoning", ("agent", "kind"))
+        self.tool_seconds = r.histogram(
+            "hitl_tool_call_seconds", "Latency of tool calls",
+            ("agent", "tool"))
+        self.tool_errors = r.counter(
+            "hitl_tool_errors_total", "Tool calls that failed",
+            ("agent", "tool"))
+        self.handoffs = r.counter(
+            "hitl_handoffs_total", "Handoffs between agents",
+            ("source", "target"))
+        self.handoff_seconds = r.histogram(
+            "hitl_handoff_seconds", "Time the source agent ran before"
+            " handing off", ("source", "target"))
+
+    def model_call(self, agent: str, seconds: float | None,
+                   usage: Any) -> None:
+        if seconds is not None:
+            self.model_seconds.observe(seconds, agent)
+        for kind, count in token_counts(usage).items():
+            self.tokens.inc(agent, kind, amount=count)
+            if kind == "input":
+                self.input_tokens.observe(count, agent)
+
+    def agent_run(self, agent: str, seconds: float,
+                  usage: Any = None) -> None:
+        """An agent ended or handed off, usage is what its model calls
+        used in total"""
+        self.agent_seconds.observe(seconds, agent)
+        for kind, count in token_counts(usage).items():
+            self.tokens.inc(agent, kind, amount=count)
+
+    def tool_call(self, agent: str, tool: str, seconds: float,
+                  failed: bool = False) -> None:
+        self.tool_seconds.observe(seconds, agent, tool)
+        if failed:
+            self.tool_errors.inc(agent, tool)
+
+    def handoff(self, source: str, target: str,
+                seconds: float | None = None) -> None:
+        self.handoffs.inc(source, target)
+        if seconds is not None:
+            self.handoff_seconds.observe(seconds, source, target)
+
+
+class HttpMetricsBackend:
+    """
+    Local HTTP endpoint for Prometheus:
+
+        GET /metrics    every metric in the Prometheus text format
+    """
+
+    def __init__(self,
+                 registry: MetricsRegistry,
+                 host: str = "127.0.0.1",
+                 port: int = 9464):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server: asyncio.Server | None = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle,
+                                                  self.host, self.port)
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter) -> None:
+        try:
+            method, path, _ = (await reader.readline()).decode().split(" ", 2)
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+        except ValueError:
+            writer.close()
+            return
+        if method == "GET" and path.split("?")[0] == "/metrics":
+            status = "200 OK"
+            body = self.registry.render().encode()
+        else:
+            status = "404 Not Found"
+            body = b"not found\n"
+        writer.write(f"HTTP/1.1 {status}\r\n"
+                     "Content-Type: text/plain; version=0.0.4\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     "Connection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+        writer.close()
@@ -0,0 +1,315 @@
+from dataclasses import dataclass
+from collections import OrderedDict, deque
+from email.utils import getaddresses
+from fnmatch import translate
+from typing import Any, Callable
+import json
+import re
+import time
+
+
+APPROVE = "approve"
+DENY = "deny"
+ESCALATE = "escalate"
+
+
+@dataclass(slots=True)
+class Rule:
+    """
+    A policy rule, the first rule matching a call decides it
+
+    Args:
+        tools: glob over tool names, e.g. "Google_*"
+        action: APPROVE, DENY or ESCALATE (ask a human)
+        when: predicate over the call arguments, the rule only matches if
+            it returns True. Must only depend on the arguments, its
+            results are cached.
+        name: shown as the reason of the decision
+        deadline: seconds a human has to decide an escalated call,
+            defaults to the policy's deadline
+        on_timeout: APPROVE, DENY or ESCALATE (ask again) once the
+            deadline passes, defaults to the policy's
+    """
+
+    tools: str
+    action: str
+    when: Callable[[dict[str, Any]], bool] | None = None
+    name: str = ""
+    deadline: float | None = None
+    on_timeout: str | None = None
+
+
+@dataclass(slots=True)
+class Limit:
+    """
+    At most max_calls automatic approvals per user every period seconds for
+    the tools matching the glob, a budget is a limit with a long period.
+    Calls over the limit are escalated to a human.
+    """
+
+    tools: str
+    max_calls: int
+    period: float
+
+
+@dataclass(slots=True)
+class Decision:
+    action: str
+    reason: str
+    # only used by ESCALATE, see Rule
+    deadline: float | None = None
+    on_timeout: str = DENY
+
+
+def arg_in(name: str, allowed: set[str]) -> Callable[[dict[str, Any]], bool]:
+    """Predicate: the argument is one of the allowed values"""
+    allowed = {value.lower() for value in allowed}
+
+    def predicate(args: dict[str, Any]) -> bool:
+        return str(args.get(name, "")).lower() in allowed
+    return predicate
+
+
+def recipient_domain_in(*domains: str,
+                        fields: tuple[str, ...] = ("recipient", "cc", "bcc")
+                        ) -> Callable[[dict[str, Any]], bool]:
+    """
+    Predicate: every address in the fields belongs to one of the domains.
+    A field may hold a list or a string of several addresses separated by
+    "," or ";". Anything that doesn't parse into plain addresses, e.g. a
+    display name hiding a second address, doesn't match.
+    """
+    domains = {domain.lower() for domain in domains}
+
+    def predicate(args: dict[str, Any]) -> bool:
+        values = []
+        for name in fields:
+            value = args.get(name) or []
+            values.extend([value] if isinstance(value, str) else value)
+        addresses = []
+        for value in values:
+            value = str(value).replace(";", ",")
+            parsed = [address for _, address in getaddresses([value])]
+            # one address per "@", nothing dropped or merged by the parser
+            if len(parsed) != value.count("@"):
+                return False
+            addresses.extend(parsed)
+        return bool(addresses) and all(
+            _ADDRESS.fullmatch(address)
+            and address.rsplit("@", 1)[1].lower() in domains
+            for address in addresses)
+    return predicate
+
+
+_ADDRESS = re.compile(r"[^@\s<>,;]+@[^@\s<>,;]+")
+
+
+DEFAULT_RULES = [
+    Rule("Google_SendEmail", ESCALATE, name="sends email"),
+    Rule("Slack_SendDmToUser", ESCALATE, name="sends a Slack message"),
+    Rule("*", APPROVE, name="read-only"),
+]
+
+# arguments that make two calls "similar" for approval grants
+DEFAULT_SIMILAR_ON = {
+    "Google_SendEmail": ("recipient", "cc", "bcc"),
+    "Slack_SendDmToUser": ("user_name",),
+}
+
+
+class ApprovalPolicy:
+    """
+    Decides whether a tool call can run without asking a human.
+
+    Rules are compiled once: the globs become regular expressions and the
+    rules that can match a tool are resolved the first time the tool is
+    seen, so a decision is a dict lookup plus the tool's predicates. Rule
+    outcomes are cached per (tool, arguments). On top of the rules:
+
+    - approvals by rule are counted against per-user limits, calls over a
+      limit are escalated;
+    - humans can grant "approve similar calls for N minutes", similar calls
+      share the tool and the arguments listed in similar_on.
+
+    Tool names are compared with "." and "_" treated alike.
+
+    Args:
+        rules: evaluated in order, the first match decides
+        default: action when no rule matches
+        limits: per-user rate limits and budgets on automatic approvals
+        similar_on: tool name to the arguments compared by grants, tools
+            not listed compare the tool name only
+        cache_size: maximum number of cached rule outcomes
+        deadline: seconds a human has to decide an escalated call, None
+            waits forever
+        on_timeout: what happens to calls nobody decided in time
+    """
+
+    def __init__(self,
+                 rules: list[Rule] | None = None,
+                 default: str = ESCALATE,
+                 limits: list[Limit] | None = None,
+                 similar_on: dict[str, tuple[str, ...]] | None = None,
+                 cache_size: int = 4096,
+                 deadline: float | None = 5 * 60,
+                 on_timeout: str = DENY):
+        self.rules = [(re.compile(translate(self._normalize(rule.tools))),
+                       rule)
+                      for rule in (DEFAULT_RULES if rules is None else rules)]
+        self.default = default
+        self.limits = [(re.compile(translate(self._normalize(limit.tools))),
+                        limit)
+                       for limit in limits or []]
+        self.similar_on = {self._normalize(k): v
+                           for k, v in (DEFAULT_SIMILAR_ON
+                                        if similar_on is None
+                                        else similar_on).items()}
+        self.cache_size = cache_size
+        self.deadline = deadline
+        self.on_timeout = on_timeout
+        self._tool_rules: dict[str, list[Rule]] = {}
+        self._tool_limits: dict[str, list[int]] = {}
+        self._cache: OrderedDict[tuple[str, str], Decision] = OrderedDict()
+        self._calls: dict[tuple[str, int], deque[float]] = {}
+        self._grants: dict[tuple[str, str, tuple], float] = {}
+
+    @staticmethod
+    def _normalize(tool_name: str) -> str:
+        return tool_name.replace(".", "_")
+
+    def _rules_for(self, tool_name: str) -> list[Rule]:
+        rules = self._tool_rules.get(tool_name)
+        if rules is None:
+            rules = []
+            for pattern, rule in self.rules:
+                if pattern.match(tool_name):
+                    rules.append(rule)
+                    # nothing after an unconditional rule can match
+                    if rule.when is None:
+                        break
+            self._tool_rules[tool_name] = rules
+        return rules
+
+    def _limits_for(self, tool_name: str) -> list[int]:
+        limits = self._tool_limits.get(tool_name)
+        if limits is None:
+            limits = [i for i, (pattern, _) in enumerate(self.limits)
+                      if pattern.match(tool_name)]
+            self._tool_limits[tool_name] = limits
+        return limits
+
+    @staticmethod
+    def _similar_value(value: Any) -> Any:
+        """Case, surrounding whitespace and list order don't matter"""
+        if value is None:
+            return ()
+        if isinstance(value, (list, tuple, set, frozenset)):
+            return tuple(sorted(str(item).strip().lower() for item in value))
+        return str(value).strip().lower()
+
+    def _similar(self, tool_name: str, args: dict[str, Any]) -> tuple:
+        return tuple(self._similar_value(args.get(name))
+                     for name in self.similar_on.get(tool_name, ()))
+
+    def always_approves(self, tool_name: str) -> bool:
+        """True if calls to the tool never need a human or a denial, such
+        tools don't need a human-in-the-loop wrapper at all"""
+        tool_name = self._normalize(tool_name)
+        rules = self._rules_for(tool_name)
+        if self._limits_for(tool_name):
+            return False
+        if any(rule.action != APPROVE for rule in rules):
+            return False
+        return bool(rules and rules[-1].when is None) or self.default == APPROVE
+
+    def _evaluate(self, tool_name: str, args: dict[str, Any]) -> Decision:
+        key = (tool_name,
+               json.dumps(args, sort_keys=True, separators=(",", ":"),
+                          default=str))
+        decision = self._cache.get(key)
+        if decision is not None:
+            self._cache.move_to_end(key)
+            return decision
+        decision = Decision(self.default, "no matching rule",
+                            self.deadline, self.on_timeout)
+        for rule in self._rules_for(tool_name):
+            if rule.when is None or rule.when(args):
+                decision = Decision(
+                    rule.action,
+                    rule.name or rule.tools,
+                    self.deadline if rule.deadline is None else rule.deadline,
+                    rule.on_timeout or self.on_timeout)
+                break
+        self._cache[key] = decision
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return decision
+
+    def _within_limits(self, user_id: str, tool_name: str,
+                       consume: bool) -> Limit | None:
+        """Count an automatic approval, returns the exceeded limit if any"""
+        now = time.monotonic()
+        windows = []
+        for i in self._limits_for(tool_name):
+            limit = self.limits[i][1]
+            calls = self._calls.setdefault((user_id, i), deque())
+            while calls and calls[0] <= now - limit.period:
+                calls.popleft()
+            if len(calls) >= limit.max_calls:
+                return limit
+            windows.append(calls)
+        if consume:
+            for calls in windows:
+                calls.append(now)
+        return None
+
+    def decide(self,
+               user_id: str,
+               tool_name: str,
+               args: dict[str, Any],
+               consume: bool = True) -> Decision:
+        """
+        Decide a tool call
+
+        Args:
+            consume: count an automatic approval against the user's limits,
+                False to only look ahead
+
+        Returns:
+            Decision: APPROVE or DENY are final, ESCALATE asks a human
+        """
+        tool_name = self._normalize(tool_name)
+        decision = self._evaluate(tool_name, args)
+        if decision.action == ESCALATE:
+            key = (user_id, tool_name, self._similar(tool_name, args))
+            expires = self._grants.get(key)
+            if expires is None:
+                return decision
+            if expires <= time.monotonic():
+                del self._grants[key]
+                return decision
+            # a human already approved calls like this one
+            return Decision(APPROVE, "approved by a grant")
+        if decision.action == APPROVE:
+            limit = self._within_limits(user_id, tool_name, consume)
+            if limit is not None:
+                # never approved by default, that's what the limit is for
+                return Decision(ESCALATE,
+                                f"more than {limit.max_calls} calls to"
+                                f" {limit.tools} in {limit.period:g}s",
+                                self.deadline, DENY)
+        return decision
+
+    def grant(self,
+              user_id: str,
+              tool_name: str,
+              args: dict[str, Any],
+              minutes: float) -> None:
+        """Approve calls similar to this one for the next minutes"""
+        tool_name = self._normalize(tool_name)
+        key = (user_id, tool_name, self._similar(tool_name, args))
+        self._grants[key] = time.monotonic() + minutes * 60
+
+    def revoke_grants(self, user_id: str) -> None:
+        for key in [key for key in self._grants if key[0] == user_id]:
+            del self._grants[key]
@@ -0,0 +1,141 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, TypeVar
+import hashlib
+import json
+
+
+T = TypeVar("T")
+
+
+def canonical_json(value: Any) -> str:
+    """One serialization per value: sorted keys, no optional whitespace"""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"),
+                      ensure_ascii=False, default=str)
+
+
+def canonical(value: Any) -> Any:
+    """Copy of a JSON value (e.g. a tool schema) with every dict sorted by
+    key, so it serializes the same however it was built"""
+    return json.loads(canonical_json(value))
+
+
+def stable_text(text: str) -> str:
+    """Prompt text with line endings and trailing whitespace normalized"""
+    return "\n".join(line.rstrip()
+                     for line in text.replace("\r\n", "\n").split("\n")
+                     ).strip()
+
+
+def sort_by_name(items: Iterable[T],
+                 name: Callable[[T], str] = lambda item: item.name
+                 ) -> list[T]:
+    """Tools in one order whatever order they were loaded in"""
+    return sorted(items, key=name)
+
+
+def get_field(obj: Any, name: str) -> Any:
+    """obj[name] of a dict, obj.name of anything else, None if missing"""
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+def cache_usage(usage: Any) -> tuple[int, int] | None:
+    """
+    (prompt tokens, cached prompt tokens) of a model call, from the usage
+    as reported by LangChain (usage_metadata), the OpenAI Responses and
+    Chat Completions APIs (usage, as objects or dicts) or Gemini
+    (usage_metadata)
+
+    Returns:
+        None if the usage has no prompt token count
+    """
+    if usage is None:
+        return None
+    prompt_tokens = None
+    for total, details, cached in (
+            ("input_tokens", "input_token_details", "cache_read"),
+            ("input_tokens", "input_tokens_details", "cached_tokens"),
+            ("prompt_tokens", "prompt_tokens_details", "cached_tokens"),
+            ("prompt_token_count", None, "cached_content_token_count")):
+        count = get_field(usage, total)
+        if count is None:
+            continue
+        prompt_tokens = count
+        source = usage if details is None else get_field(usage, details)
+        if source is not None:
+            return count, get_field(source, cached) or 0
+    return None if prompt_tokens is None else (prompt_tokens, 0)
+
+
+@dataclass(slots=True)
+class CacheUsage:
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    calls: int = 0
+
+    @property
+    def ratio(self) -> float:
+        """Share of the prompt tokens served from the provider's cache"""
+        if not self.prompt_tokens:
+            return 0.0
+        return self.cached_tokens / self.prompt_tokens
+
+    def add(self, prompt_tokens: int, cached_tokens: int) -> None:
+        self.prompt_tokens += prompt_tokens
+        self.cached_tokens += cached_tokens
+        self.calls += 1
+
+    def __str__(self) -> str:
+        return (f"{self.cached_tokens:,}/{self.prompt_tokens:,} prompt tokens"
+                f" cached ({self.ratio:.0%}) over {self.calls} model calls")
+
+
+class PromptCacheStats:
+    """
+    Prompt cache hits per turn and overall, and a check that the prefix
+    of each agent's requests (system prompt and tool schemas) stays the
+    same byte for byte, a changed prefix starts the cache over.
+
+    Args:
+        max_turns: turns kept in turns, older ones are dropped
+    """
+
+    def __init__(self, max_turns: int = 1024):
+        self.turns: deque[CacheUsage] = deque(maxlen=max_turns)
+        self.total = CacheUsage()
+        self.prefix_changes = 0
+        self._open: dict[str, CacheUsage] = {}
+        self._prefixes: dict[str, str] = {}
+
+    def record(self, usage: Any, key: str = "") -> None:
+        """Count a model call of the turn in progress under key, e.g. a
+        thread or session id when several run at once"""
+        counts = cache_usage(usage)
+        if counts is None:
+            return
+        self._open.setdefault(key, CacheUsage()).add(*counts)
+        self.total.add(*counts)
+
+    def end_turn(self, key: str = "") -> CacheUsage:
+        """Close the turn in progress under key and return its usage"""
+        turn = self._open.pop(key, CacheUsage())
+        self.turns.append(turn)
+        return turn
+
+    def check_prefix(self, label: str, *parts: Any) -> bool:
+        """
+        Compare the prefix parts of a request with the previous request of
+        the same label (e.g. the agent)
+
+        Returns:
+            bool: False if the prefix changed since that request
+        """
+        digest = hashlib.sha256(canonical_json(parts).encode()).hexdigest()
+        previous = self._prefixes.get(label)
+        self._prefixes[label] = digest
+        if previous is not None and previous != digest:
+            self.prefix_changes += 1
+            return False
+        return True
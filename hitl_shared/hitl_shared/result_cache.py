@@ -0,0 +1,90 @@
+from collections import OrderedDict
+from typing import Any
+import json
+import time
+
+
+class ResultCache:
+    """
+    Opt-in cache of read-only tool results.
+
+    Results are keyed by (user_id, tool_name, canonical args) and kept for
+    the tool's TTL, only tools listed in ``ttls`` are cached. A successful
+    call to one of ``write_tools`` drops every cached result of the same
+    user and toolkit, e.g. Google_SendEmail invalidates Google_ListEmails.
+    Tool names are compared with "." and "_" treated alike.
+
+    Args:
+        ttls: seconds each read tool's results stay valid.
+        write_tools: tools whose calls invalidate their toolkit's results.
+        maxsize: maximum number of cached results, least recently used
+            ones are evicted first.
+    """
+
+    MISS = object()
+
+    def __init__(self,
+                 ttls: dict[str, float] | None = None,
+                 write_tools: set[str] | None = None,
+                 maxsize: int = 1024):
+        if ttls is None:
+            ttls = {"Google_ListEmails": 60, "Slack_ListUsers": 300}
+        if write_tools is None:
+            write_tools = {"Google_SendEmail", "Slack_SendDmToUser"}
+        self.ttls = {self._normalize(k): v for k, v in ttls.items()}
+        self.write_tools = {self._normalize(t) for t in write_tools}
+        self.maxsize = maxsize
+        self._data: OrderedDict[tuple[str, str, str], tuple[float, Any]] = (
+            OrderedDict())
+
+    @staticmethod
+    def _normalize(tool_name: str) -> str:
+        return tool_name.replace(".", "_")
+
+    @staticmethod
+    def _toolkit(tool_name: str) -> str:
+        return tool_name.split("_", 1)[0]
+
+    def _key(self, user_id: str, tool_name: str,
+             args: dict[str, Any]) -> tuple[str, str, str]:
+        return (user_id,
+                self._normalize(tool_name),
+                json.dumps(args, sort_keys=True, separators=(",", ":"),
+                           default=str))
+
+    def get(self, user_id: str, tool_name: str, args: dict[str, Any]) -> Any:
+        """The cached result, or ResultCache.MISS"""
+        if self._normalize(tool_name) not in self.ttls:
+            return self.MISS
+        key = self._key(user_id, tool_name, args)
+        entry = self._data.get(key)
+        if entry is None:
+            return self.MISS
+        if entry[0] <= time.monotonic():
+            del self._data[key]
+            return self.MISS
+        self._data.move_to_end(key)
+        return entry[1]
+
+    def record(self, user_id: str, tool_name: str, args: dict[str, Any],
+               result: Any) -> None:
+        """Record a successful call: read tools are cached and write tools
+        invalidate the user's results for their toolkit"""
+        tool_name = self._normalize(tool_name)
+        if tool_name in self.write_tools:
+            self.invalidate(user_id, self._toolkit(tool_name))
+        ttl = self.ttls.get(tool_name)
+        if ttl is None:
+            return
+        key = self._key(user_id, tool_name, args)
+        self._data[key] = (time.monotonic() + ttl, result)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, user_id: str, toolkit: str | None = None) -> None:
+        """Drop the user's cached results, optionally only for one toolkit"""
+        for key in list(self._data):
+            if key[0] == user_id and (
+                    toolkit is None or self._toolkit(key[1]) == toolkit):
+                del self._data[key]
@@ -0,0 +1,268 @@
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Hashable, Protocol
+import atexit
+import json
+import random
+import threading
+import time
+
+
+@dataclass(slots=True)
+class Span:
+    name: str
+    trace_id: int
+    span_id: int
+    parent_id: int | None
+    start_ns: int
+    end_ns: int | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    # (time, name, attributes)
+    events: list[tuple[int, str, dict[str, Any]]] = field(default_factory=list)
+    error: str | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "trace_id": f"{self.trace_id:032x}",
+            "span_id": f"{self.span_id:016x}",
+            "parent_id": (None if self.parent_id is None
+                          else f"{self.parent_id:016x}"),
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": (None if self.end_ns is None
+                            else (self.end_ns - self.start_ns) / 1e6),
+            "attributes": self.attributes,
+            "events": [{"time_ns": at, "name": name, "attributes": attributes}
+                       for at, name, attributes in self.events],
+            "error": self.error,
+        }
+
+
+class SpanExporter(Protocol):
+    def export(self, spans: list[Span]) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class JsonlExporter:
+    """Appends one JSON object per span to a file"""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._file = None
+
+    def export(self, spans: list[Span]) -> None:
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        for span in spans:
+            self._file.write(json.dumps(span.to_dict(), default=str) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict[str, Any]) -> list[dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)}
+            for key, value in attributes.items() if value is not None]
+
+
+class OtlpJsonExporter:
+    """
+    Appends the spans to a file as OTLP/JSON export requests, one per line
+    and flush, the format the OpenTelemetry Collector's file exporter
+    writes and its otlpjsonfile receiver reads, so the traces can be sent
+    on to Jaeger, Tempo... later without being online now.
+
+    Args:
+        path: file the requests are appended to
+        service_name: service.name of the resource
+    """
+
+    def __init__(self, path: str | Path, service_name: str = "hitl"):
+        self.path = Path(path)
+        self.service_name = service_name
+        self._file = None
+
+    @staticmethod
+    def _span(span: Span) -> dict[str, Any]:
+        otlp = {
+            "traceId": f"{span.trace_id:032x}",
+            "spanId": f"{span.span_id:016x}",
+            "name": span.name,
+            # internal
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns or span.start_ns),
+            "attributes": _otlp_attributes(span.attributes),
+            "events": [{"timeUnixNano": str(at), "name": name,
+                        "attributes": _otlp_attributes(attributes)}
+                       for at, name, attributes in span.events],
+            # ok or error
+            "status": ({"code": 1} if span.error is None
+                       else {"code": 2, "message": span.error}),
+        }
+        if span.parent_id is not None:
+            otlp["parentSpanId"] = f"{span.parent_id:016x}"
+        return otlp
+
+    def export(self, spans: list[Span]) -> None:
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        request = {"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes(
+                {"service.name": self.service_name})},
+            "scopeSpans": [{"scope": {"name": "hitl.tracing"},
+                            "spans": [self._span(span) for span in spans]}],
+        }]}
+        self._file.write(json.dumps(request, default=str) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# stands for the open spans of traces that weren't sampled, so their
+# children aren't recorded either
+_NOT_SAMPLED = Span("", 0, 0, None, 0)
+
+
+class Tracer:
+    """
+    Records spans without doing I/O on the calling path: ended spans go in
+    a ring buffer and a background thread hands them to the exporters every
+    flush_interval seconds. When the buffer is full the oldest spans are
+    dropped and counted in dropped.
+
+    Spans are opened and closed by key, e.g. (run, agent), since hooks and
+    callbacks only share what the framework passes them. A span started
+    without a parent starts a trace, sampled with probability sample_rate,
+    its descendants follow the same decision.
+
+    Args:
+        exporters: where the spans go, e.g. JsonlExporter and
+            OtlpJsonExporter
+        sample_rate: share of the traces recorded
+        capacity: ended spans the ring buffer holds
+        flush_interval: seconds between exports
+    """
+
+    def __init__(self,
+                 exporters: list[SpanExporter],
+                 sample_rate: float = 1.0,
+                 capacity: int = 4096,
+                 flush_interval: float = 1.0):
+        self.exporters = exporters
+        self.sample_rate = sample_rate
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._buffer: deque[Span] = deque(maxlen=capacity)
+        self._open: dict[Hashable, Span] = {}
+        self._wake = threading.Event()
+        self._closed = False
+        self._flusher: threading.Thread | None = None
+        self._export_lock = threading.Lock()
+
+    def start(self,
+              key: Hashable,
+              name: str,
+              parent: Hashable | None = None,
+              **attributes: Any) -> None:
+        """Open the span key, as a child of the open span parent if any"""
+        previous = self._open.pop(key, None)
+        if previous is not None:
+            self._finish(previous, "not ended")
+        parent_span = None if parent is None else self._open.get(parent)
+        if parent_span is _NOT_SAMPLED or (
+                parent_span is None and random.random() >= self.sample_rate):
+            self._open[key] = _NOT_SAMPLED
+            return
+        self._open[key] = Span(
+            name=name,
+            trace_id=(random.getrandbits(128) if parent_span is None
+                      else parent_span.trace_id),
+            span_id=random.getrandbits(64),
+            parent_id=None if parent_span is None else parent_span.span_id,
+            start_ns=time.time_ns(),
+            attributes=attributes,
+        )
+
+    def event(self, key: Hashable, name: str, **attributes: Any) -> None:
+        """Add a timestamped event to the open span key"""
+        span = self._open.get(key)
+        if span is not None and span is not _NOT_SAMPLED:
+            span.events.append((time.time_ns(), name, attributes))
+
+    def end(self,
+            key: Hashable,
+            error: str | None = None,
+            **attributes: Any) -> None:
+        """Close the span key, does nothing if it isn't open"""
+        span = self._open.pop(key, None)
+        if span is None or span is _NOT_SAMPLED:
+            return
+        span.attributes.update(attributes)
+        self._finish(span, error)
+
+    def _finish(self, span: Span, error: str | None) -> None:
+        if span is _NOT_SAMPLED:
+            return
+        span.end_ns = time.time_ns()
+        span.error = error
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append(span)
+        if self._flusher is None and not self._closed:
+            self._flusher = threading.Thread(target=self._run, daemon=True,
+                                             name="span-flusher")
+            self._flusher.start()
+            atexit.register(self.close)
+
+    def flush(self) -> None:
+        """Export the ended spans now"""
+        with self._export_lock:
+            spans = []
+            while self._buffer:
+                spans.append(self._buffer.popleft())
+            if not spans:
+                return
+            for exporter in self.exporters:
+                try:
+                    exporter.export(spans)
+                except Exception as e:
+                    # tracing never takes the agents down
+                    print(f"### {type(exporter).__name__} failed: {e}")
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self.flush()
+
+    def close(self) -> None:
+        """Stop the flusher and export what is left, open spans are lost"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            atexit.unregister(self.close)
+        self.flush()
+        for exporter in self.exporters:
+            exporter.close()